@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+
+class AggregationPlan:
+    """Collects every (grouping key, column, statistic) a run needs before touching the data.
+
+    run() then does a single groupby per key, one reduction per statistic, and the plotting
+    sections read their tables back out of the shared AggregationResult.
+    """
+
+    def __init__(self):
+        self._stats = {}   # key -> {stat: [columns]}
+        self._sizes = []   # keys that need group sizes
+        self._splits = {}  # key -> [columns] whose per-group values are needed as arrays
+
+    def add(self, key, columns, stat='mean'):
+        cols = self._stats.setdefault(key, {}).setdefault(stat, [])
+        for col in columns:
+            if col not in cols:
+                cols.append(col)
+        return self
+
+    def add_size(self, key):
+        if key not in self._sizes:
+            self._sizes.append(key)
+        return self
+
+    def add_split(self, key, column):
+        cols = self._splits.setdefault(key, [])
+        if column not in cols:
+            cols.append(column)
+        return self
+
+    def requests(self):
+        """(key, stat, columns) for every planned reduction."""
+        return [(key, stat, list(cols)) for key, stats in self._stats.items() for stat, cols in stats.items()]
+
+    def size_keys(self):
+        return list(self._sizes)
+
+    def split_requests(self):
+        """(key, column) for every column whose per-group values are needed."""
+        return [(key, col) for key, cols in self._splits.items() for col in cols]
+
+    def keys(self):
+        return list(dict.fromkeys([*self._stats, *self._sizes, *self._splits]))
+
+    def run(self, df):
+        tables, sizes, splits = {}, {}, {}
+        for key in self.keys():
+            grouped = df.groupby(key, observed=True, sort=True)
+            for stat, cols in self._stats.get(key, {}).items():
+                # float32 columns (compact schema) would be reduced in float32; reduce in float64
+                narrow = {col: 'float64' for col in cols if df[col].dtype == np.float32}
+                if narrow:
+                    tables[key, stat] = df[cols].astype(narrow).groupby(df[key], observed=True, sort=True).agg(stat)
+                else:
+                    tables[key, stat] = grouped[cols].agg(stat)
+            if key in self._sizes:
+                sizes[key] = grouped.size()
+            for col in self._splits.get(key, []):
+                splits[key, col] = _split(df[key], grouped[col])
+        return AggregationResult(tables, sizes, splits)
+
+
+class AggregationResult:
+    def __init__(self, tables, sizes, splits):
+        self._tables = tables
+        self._sizes = sizes
+        self._splits = splits
+
+    def table(self, key, columns, stat='mean'):
+        """Group-by-`key` table of `stat` for `columns`, in the order asked for."""
+        try:
+            result = self._tables[key, stat]
+        except KeyError:
+            raise KeyError(f'{stat!r} by {key!r} was not planned') from None
+        missing = [col for col in columns if col not in result.columns]
+        if missing:
+            raise KeyError(f'{stat!r} by {key!r} was not planned for {missing}')
+        return result[list(columns)]
+
+    def size(self, key):
+        return self._sizes[key]
+
+    def split(self, key, column):
+        """{group: non-null values of column} for every group of key."""
+        return self._splits[key, column]
+
+
+def _split(key_col, grouped_col):
+    # categorical keys keep their unobserved groups, as empty arrays
+    out = {}
+    if isinstance(key_col.dtype, pd.CategoricalDtype):
+        out = {cat: np.array([], dtype='float64') for cat in key_col.cat.categories}
+    for group, values in grouped_col:
+        out[group] = values.dropna().to_numpy()
+    return out
@@ -0,0 +1,188 @@
+"""Dataframe backends for the ingest, feature and aggregation stages.
+
+A backend loads the chart CSV, derives the features and answers the grouped tables and
+crosstabs; everything it returns is plain pandas (an AggregationResult, crosstab frames,
+row frames for the row-level accumulators), so the statistics and figures don't know which
+backend ran.
+
+    pandas  eager pandas, the reference
+    polars  lazy Polars: the scan parses only the used columns and is collected once with the
+            features; every group-by and crosstab of a run is then a lazy query over that
+            frame, optimized and collected together on Polars' thread pool
+
+Both give the same tables (see billboard.py compare-backends). Polars is optional.
+"""
+import numpy as np
+import pandas as pd
+
+from aggregate import AggregationResult
+from features import ERA_BOUNDARIES, ERA_NAMES, FLAG_SPECS, derive_features
+from ingest import COLS, DTYPES, load_data
+
+# strings read_csv treats as missing by default; Polars is given the same ones
+PANDAS_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+class PandasBackend:
+    """Eager pandas: frames are DataFrames holding every row."""
+
+    name = 'pandas'
+
+    def load(self, path, compact=False):
+        return load_data(path, compact=compact)
+
+    def features(self, frame, boundaries=ERA_BOUNDARIES, names=ERA_NAMES):
+        return derive_features(frame, boundaries, names)
+
+    def count(self, frame):
+        return len(frame)
+
+    def summary(self, frame):
+        """(rows, first date, last date)."""
+        return len(frame), frame['Date'].min(), frame['Date'].max()
+
+    def range(self, frame, col):
+        return frame[col].min(), frame[col].max()
+
+    def aggregate(self, frame, plan):
+        return plan.run(frame)
+
+    def crosstab(self, frame, row, col, bins=None, labels=None):
+        """Row x col counts as pd.crosstab; with bins, col is first cut into equal-width classes as pd.cut."""
+        columns = frame[col] if bins is None else pd.cut(frame[col], bins=bins, labels=labels)
+        return pd.crosstab(frame[row], columns)
+
+    def rows(self, frame, columns):
+        """A pandas DataFrame with (at least) these columns, for the row-level accumulators."""
+        return frame
+
+
+class PolarsBackend:
+    """Lazy Polars: load() is a LazyFrame scan, features() collects it once into a DataFrame."""
+
+    name = 'polars'
+
+    def __init__(self):
+        try:
+            import polars
+        except ImportError:
+            raise ImportError('the polars backend needs polars (pip install polars)') from None
+        self.pl = polars
+
+    def load(self, path, compact=False):
+        pl = self.pl
+        schema = {col: pl.String if dtype is str else pl.Float64 for col, dtype in DTYPES.items()}
+        scan = pl.scan_csv(path, schema_overrides={**schema, 'Date': pl.String}, null_values=PANDAS_NA_VALUES)
+        return (scan.select(COLS)
+                .with_columns(pl.col('Date').str.to_datetime(time_unit='us'))
+                .sort('Date', maintain_order=True))
+
+    def features(self, frame, boundaries=ERA_BOUNDARIES, names=ERA_NAMES):
+        pl = self.pl
+        if len(names) != len(boundaries) + 1:
+            raise ValueError(f'{len(boundaries)} era boundaries need {len(boundaries) + 1} names, got {len(names)}')
+        year = pl.col('Date').dt.year()
+        # the first era whose end is after the year, as features.assign_era
+        era = pl.when(year < boundaries[0]).then(pl.lit(names[0]))
+        for boundary, name in zip(boundaries[1:], names[1:]):
+            era = era.when(year < boundary).then(pl.lit(name))
+        era = era.otherwise(pl.lit(names[-1]))
+        # missing source values compare as null; as in pandas they switch the flag off
+        flags = [(pl.col(col) == code).fill_null(False).cast(pl.Int8).alias(name)
+                 for name, (col, code) in FLAG_SPECS.items()]
+        return frame.lazy().with_columns(
+            year.alias('Year'),
+            (year // 10 * 10).alias('Decade'),
+            # Polars turns `/ 60` into `* (1 / 60)`, which can be a bit off from pandas; divide as NumPy does
+            pl.col('Length (Sec)').map_batches(lambda sec: pl.Series(sec.to_numpy() / 60, nan_to_null=True),
+                                               return_dtype=pl.Float64).alias('Length (min)'),
+            pl.when(year.is_not_null()).then(era).cast(pl.Enum(names)).alias('Era'),
+            *flags,
+        ).collect()
+
+    def count(self, frame):
+        return frame.height if isinstance(frame, self.pl.DataFrame) else None
+
+    def summary(self, frame):
+        pl = self.pl
+        rows, first, last = frame.lazy().select(pl.len(), pl.col('Date').min().alias('first'),
+                                                pl.col('Date').max().alias('last')).collect().row(0)
+        return rows, pd.Timestamp(first), pd.Timestamp(last)
+
+    def range(self, frame, col):
+        pl = self.pl
+        return frame.lazy().select(pl.col(col).min().alias('min'), pl.col(col).max().alias('max')).collect().row(0)
+
+    def _index(self, keys):
+        # the pandas index a groupby on the same column gives (ordered categorical for Era)
+        if keys.dtype == self.pl.Enum:
+            return pd.CategoricalIndex(keys.to_pandas(), name=keys.name)
+        return pd.Index(keys.to_numpy(), name=keys.name)
+
+    def aggregate(self, frame, plan):
+        pl = self.pl
+        stats = {'mean': pl.Expr.mean, 'sum': pl.Expr.sum, 'count': pl.Expr.count, 'min': pl.Expr.min,
+                 'max': pl.Expr.max, 'median': pl.Expr.median, 'std': pl.Expr.std, 'var': pl.Expr.var}
+        keys = plan.keys()
+        requests = plan.requests()
+        splits = plan.split_requests()
+        # one query per key, all collected together
+        queries = []
+        for key in keys:
+            exprs = [pl.len().alias('size')]
+            for k, stat, cols in requests:
+                if k == key:
+                    if stat not in stats:
+                        raise ValueError(f'the polars backend has no {stat!r} statistic')
+                    exprs += [stats[stat](pl.col(col)).alias(f'{stat}/{col}') for col in cols]
+            exprs += [pl.col(col).drop_nulls().alias(f'split/{col}') for k, col in splits if k == key]
+            queries.append(frame.lazy().filter(pl.col(key).is_not_null()).group_by(key).agg(exprs).sort(key))
+
+        tables, sizes, values = {}, {}, {}
+        for key, result in zip(keys, pl.collect_all(queries)):
+            index = self._index(result[key])
+            for k, stat, cols in requests:
+                if k == key:
+                    tables[key, stat] = pd.DataFrame({col: result[f'{stat}/{col}'].to_numpy() for col in cols},
+                                                     index=index)
+            if key in plan.size_keys():
+                sizes[key] = pd.Series(result['size'].to_numpy().astype(np.int64), index=index)
+            for k, col in splits:
+                if k == key:
+                    # categorical keys keep their unobserved groups, as empty arrays (see aggregate._split)
+                    groups = {}
+                    if isinstance(index, pd.CategoricalIndex):
+                        groups = {cat: np.array([], dtype='float64') for cat in index.categories}
+                    for group, group_values in zip(index, result[f'split/{col}']):
+                        groups[group] = group_values.to_numpy()
+                    values[key, col] = groups
+        return AggregationResult(tables, sizes, values)
+
+    def crosstab(self, frame, row, col, bins=None, labels=None):
+        pl = self.pl
+        columns = pl.col(col)
+        if bins is not None:
+            # pd.cut(bins=n): right-closed equal-width classes over [min, max]
+            lo, hi = self.range(frame, col)
+            edges = np.linspace(lo, hi, bins + 1)
+            classes = pl.when(pl.col(col) > edges[-2]).then(pl.lit(labels[-1]))
+            for edge, label in zip(edges[-3:0:-1], labels[-2:0:-1]):
+                classes = classes.when(pl.col(col) > edge).then(pl.lit(label))
+            columns = classes.otherwise(pl.lit(labels[0])).cast(pl.Enum(labels)).alias(col)
+        counts = (frame.lazy().filter(pl.col(row).is_not_null() & pl.col(col).is_not_null())
+                  .group_by(pl.col(row), columns).len().collect())
+        rows, cols = self._index(counts[row]), self._index(counts[col])
+        table = pd.Series(counts['len'].to_numpy().astype(np.int64),
+                          index=pd.MultiIndex.from_arrays([rows, cols])).unstack(fill_value=0)
+        return table.reindex(index=rows.unique().sort_values(), columns=cols.unique().sort_values())
+
+    def rows(self, frame, columns):
+        return frame.select(list(dict.fromkeys(columns))).to_pandas()
+
+
+BACKENDS = {'pandas': PandasBackend, 'polars': PolarsBackend}
+
+
+def get_backend(name='pandas'):
+    return BACKENDS[name]()
@@ -0,0 +1,81 @@
+"""Run the analysis over many chart datasets from one JSON manifest, on a worker pool.
+
+The manifest is a list of datasets (or {"datasets": [...]}), each like
+
+    {"name": "hot100", "path": "hot100.csv", "out_dir": "out/hot100",
+     "eras": [2007, 2020], "era_names": ["Pre-Digital", "Streaming", "Post-Short-Form"],
+     "command": "all", "options": ["--trend", "104"]}
+
+Only path is required: name defaults to the file name, out_dir to the name, command to
+"all" (or "stats"/"render"; "figures" picks the figures to render), eras/era_names to the
+default eras, and options are passed on as command-line options. A relative path or out_dir
+is taken from the manifest's directory (paths inside options are passed as they are).
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def read_manifest(path):
+    """[(name, argv)] for every dataset in the manifest at path."""
+    with open(path) as f:
+        entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = entries['datasets']
+    base = os.path.dirname(os.path.abspath(path))
+    datasets = []
+    for i, entry in enumerate(entries):
+        if 'path' not in entry:
+            raise ValueError(f"{path}: dataset {i} has no 'path'")
+        name = entry.get('name') or os.path.splitext(os.path.basename(entry['path']))[0]
+        command = entry.get('command', 'all')
+        argv = [command]
+        if command == 'render':
+            figures = entry.get('figures', 'all')
+            argv.append(figures if isinstance(figures, str) else ','.join(figures))
+        argv += [os.path.join(base, entry['path']), '--out-dir', os.path.join(base, entry.get('out_dir', name))]
+        if 'eras' in entry:
+            argv += ['--eras', ','.join(str(year) for year in entry['eras'])]
+        if 'era_names' in entry:
+            argv += ['--era-names', ','.join(entry['era_names'])]
+        argv += [str(option) for option in entry.get('options', [])]
+        datasets.append((name, argv))
+    names = [name for name, argv in datasets]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"{path}: dataset names must be unique, repeated: {', '.join(duplicates)}")
+    return datasets
+
+
+def run_batch(groups, run_group, workers=1):
+    """Run groups of (name, args) on a process pool, printing each dataset's outcome as it finishes.
+
+    run_group(group) runs one group's datasets in a worker and returns [(name, error or None,
+    seconds)]; a failed dataset is reported and the rest of the batch carries on. Returns
+    {name: error or None}.
+    """
+    total = sum(len(group) for group in groups)
+    outcomes = {}
+
+    def report(results):
+        for name, error, seconds in results:
+            outcomes[name] = error
+            status = f'done in {seconds:.1f}s' if error is None else f'FAILED after {seconds:.1f}s: {error}'
+            print(f"[{len(outcomes)}/{total}] {name}: {status}", flush=True)
+
+    print(f"{total} datasets in {len(groups)} ingest groups on {min(workers, len(groups))} workers", flush=True)
+    if workers <= 1 or len(groups) <= 1:
+        for group in groups:
+            report(run_group(group))
+        return outcomes
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(groups))) as pool:
+        futures = {pool.submit(run_group, group): group for group in groups}
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                # the worker itself died (e.g. killed for memory): every dataset in its group failed
+                results = [(name, f'{type(e).__name__}: {e}', 0.0) for name, args in futures[future]]
+            report(results)
+    return outcomes
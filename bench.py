@@ -0,0 +1,203 @@
+"""Benchmark each stage of the pipeline on synthetic chart data.
+
+    python bench.py                          # 1k, 1M and 10M rows
+    python bench.py --sizes 1000 100000 --repeat 3 --out bench.json
+    python bench.py --backend polars --out bench_polars.json
+
+Synthetic CSVs are generated once per size (and seed) into --data-dir and reused. Results
+go to a JSON file tagged with the git commit, so runs from different commits can be diffed.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from backends import BACKENDS
+from ingest import COLS
+
+START, END = pd.Timestamp('1958-08-04'), pd.Timestamp('2025-01-31')
+
+GENRES = ['Pop', 'Rock', 'Funk / Soul', 'Hip Hop', 'Electronic', 'Folk, World, & Country', 'Jazz',
+          'Latin', 'Reggae', 'Blues', 'Stage & Screen', 'Classical', 'Children\'s', 'Non-Music', 'Brass & Military']
+STYLES = ['Ballad', 'Pop Rock', 'Soft Rock', 'Disco', 'Soul', 'Rhythm & Blues', 'Synth-pop', 'Trap',
+          'Contemporary R&B', 'Dance-pop', 'Vocal', 'Rock & Roll', 'Doo Wop', 'Hard Rock', 'Pop Rap',
+          'Gangsta', 'House', 'Electro', 'Country Rock', 'Funk', 'Europop', 'Teen Pop', 'Bubblegum',
+          'Folk Rock', 'Psychedelic Rock', 'New Wave', 'Alternative Rock', 'Reggaeton', 'Swing', 'Big Band']
+
+# share of missing values per column, roughly what the real export looks like
+NAN_RATES = {
+    'Label': 0.01, 'Parent Label': 0.05, 'Discogs Genre': 0.01, 'Discogs Style': 0.03,
+    'Artist Structure': 0.0, 'Multiple Lead Vocalists': 0.01, 'Front Person Age': 0.02,
+    'Artist Male': 0.005, 'Artist White': 0.01, 'Artist Black': 0.01,
+    'Songwriter Male': 0.02, 'Songwriter White': 0.03,
+    'Artist is a Songwriter': 0.01, 'Artist is Only Songwriter': 0.01,
+    'Producer Male': 0.04, 'Producer White': 0.05, 'Artist is a Producer': 0.03, 'Artist is Only Producer': 0.03,
+    'Length (Sec)': 0.005,
+}
+
+
+def _zipf_choice(rng, names, n, a=1.3):
+    # a few names take most of the rows, like record labels do
+    weights = 1 / np.arange(1, len(names) + 1) ** a
+    return rng.choice(np.asarray(names, dtype=object), size=n, p=weights / weights.sum())
+
+
+def _multi_label(rng, vocab, n, max_labels, a=1.2):
+    # comma-joined Discogs-style multi-valued field with 1..max_labels values
+    first = _zipf_choice(rng, vocab, n, a)
+    out = first.copy()
+    for _ in range(max_labels - 1):
+        extra = rng.random(n) < 0.3
+        out[extra] = out[extra] + ', ' + _zipf_choice(rng, vocab, int(extra.sum()), a)
+    return out
+
+
+def synthetic_data(n, seed=0):
+    """A DataFrame with the columns in ingest.COLS and chart-like distributions."""
+    rng = np.random.default_rng(seed)
+    days = np.sort(rng.integers(0, (END - START).days + 1, size=n))
+    labels = [f'Label {i}' for i in range(2000)]
+    parents = ['Sony', 'Universal', 'Warner', 'EMI', 'BMG', 'Independent'] + [f'Parent {i}' for i in range(40)]
+
+    def code(values, p):
+        return rng.choice(values, size=n, p=p).astype('float64')
+
+    df = pd.DataFrame({
+        'Song': np.char.add('Song ', np.arange(n).astype(str)),
+        'Date': (START + pd.to_timedelta(days, unit='D')).strftime('%Y-%m-%d'),
+        'Weeks at Number One': np.minimum(rng.geometric(0.3, size=n), 19).astype('float64'),
+        'Label': _zipf_choice(rng, labels, n),
+        'Parent Label': _zipf_choice(rng, parents, n, a=1.0),
+        'Discogs Genre': _multi_label(rng, GENRES, n, 3),
+        'Discogs Style': _multi_label(rng, STYLES, n, 4),
+        'Artist Structure': code([0, 1, 2], [0.2, 0.7, 0.1]),
+        'Multiple Lead Vocalists': code([0, 1], [0.85, 0.15]),
+        'Front Person Age': np.round(rng.normal(27, 6, size=n).clip(12, 80)),
+        'Artist Male': code([0, 1, 2], [0.3, 0.55, 0.15]),
+        'Artist White': code([0, 1], [0.45, 0.55]),
+        'Artist Black': code([0, 1], [0.65, 0.35]),
+        'Songwriter Male': code([0, 1, 2], [0.1, 0.6, 0.3]),
+        'Songwriter White': code([0, 1], [0.4, 0.6]),
+        'Artist is a Songwriter': code([0, 1], [0.45, 0.55]),
+        'Artist is Only Songwriter': code([0, 1], [0.85, 0.15]),
+        'Producer Male': code([0, 1, 2], [0.02, 0.93, 0.05]),
+        'Producer White': code([0, 1], [0.4, 0.6]),
+        'Artist is a Producer': code([0, 1], [0.75, 0.25]),
+        'Artist is Only Producer': code([0, 1], [0.95, 0.05]),
+        'Length (Sec)': np.round(rng.normal(225, 45, size=n).clip(90, 900)),
+    })
+    for col, rate in NAN_RATES.items():
+        df.loc[rng.random(n) < rate, col] = np.nan
+    assert set(COLS) <= set(df.columns)
+    return df
+
+
+def synthetic_csv(n, data_dir, seed=0):
+    path = os.path.join(data_dir, f'synthetic-{n}-{seed}.csv')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        tmp = path + '.tmp'
+        synthetic_data(n, seed).to_csv(tmp, index=False)
+        os.replace(tmp, path)
+    return path
+
+
+def _timed(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def bench_size(path, repeat=1, jobs=1, backend='pandas'):
+    """Best-of-`repeat` seconds per stage for one input file.
+
+    The analysis stages are the spans billboard.analyze() records, so they follow the pipeline.
+    """
+    import billboard
+    from backends import get_backend
+    from figures import render_all
+    from ingest import load_data, read_source
+    from instrument import Instrumentation
+
+    engine = get_backend(backend)
+    stages = {}
+    if backend == 'pandas':
+        stages['ingest_csv'], raw = _timed(lambda: read_source(path), repeat)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            load_data(path, cache_dir)
+            stages['ingest_cached'], _ = _timed(lambda: load_data(path, cache_dir), repeat)
+    else:
+        # the polars scan is lazy: collect it to time the parse on its own
+        stages['ingest_csv'], raw = _timed(lambda: engine.load(path).collect(), repeat)
+    stages['features'], df = _timed(lambda: engine.features(raw), repeat)
+
+    inputs = None
+    for _ in range(repeat):
+        inst = Instrumentation()
+        aggs, inputs = billboard.analyze(df, inst=inst, backend=engine)
+        for span in inst.spans:
+            stages[span['name']] = min(stages.get(span['name'], np.inf), span['wall_s'])
+
+    def rendering():
+        with tempfile.TemporaryDirectory() as out_dir:
+            list(render_all(inputs, out_dir, jobs=jobs, force=True))
+
+    stages['rendering'], _ = _timed(rendering, repeat)
+    stages['rows'] = engine.count(df)
+    return stages
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark billboard.py stages on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 1_000_000, 10_000_000])
+    parser.add_argument('--repeat', type=int, default=1, help='report the best of N runs per stage')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='render processes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=list(BACKENDS), default='pandas',
+                        help='dataframe engine for ingest, features and aggregation (see backends.py)')
+    parser.add_argument('--data-dir', default='.bench_data', help='where synthetic CSVs are kept')
+    parser.add_argument('--out', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    results = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'backend': args.backend,
+        'repeat': args.repeat,
+        'jobs': args.jobs,
+        'sizes': {},
+    }
+    for n in args.sizes:
+        print(f"{n} rows: generating...", flush=True)
+        path = synthetic_csv(n, args.data_dir, args.seed)
+        stages = bench_size(path, args.repeat, args.jobs, args.backend)
+        results['sizes'][str(n)] = stages
+        print('  ' + ', '.join(f'{k} {v:.3f}s' for k, v in stages.items() if k != 'rows'))
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"saved {args.out}")
+
+
+if __name__ == '__main__':
+    main()
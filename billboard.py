@@ -1,381 +1,30 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import chi2_contingency
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+import traceback
 import warnings
+from contextlib import redirect_stdout
 
-warnings.filterwarnings('ignore')
-
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
-
-path = r'C:\Users\justi\Downloads\Billboard_Hot_100_Data.csv'
-df = pd.read_csv(path)
-
-cols = ['Date', 'Weeks at Number One', 'Label', 'Parent Label',
-        'Discogs Genre', 'Discogs Style', 'Artist Structure', 'Multiple Lead Vocalists',
-        'Front Person Age', 'Artist Male', 'Artist White', 'Artist Black',
-        'Songwriter Male', 'Songwriter White',
-        'Artist is a Songwriter', 'Artist is Only Songwriter',
-        'Producer Male', 'Producer White', 'Artist is a Producer', 'Artist is Only Producer',
-        'Length (Sec)']
-df = df[cols]
-df['Date'] = pd.to_datetime(df['Date'])
-df = df.sort_values('Date').reset_index(drop=True)
-
-# derived features
-df['Year'] = df['Date'].dt.year
-df['Length (min)'] = df['Length (Sec)'] / 60
-
-
-# define "consumption eras"
-def assign_era(date):
-    year = date.year
-    if year < 2007:
-        return 'Pre-Digital'
-    elif year < 2020:
-        return 'Streaming'
-    else:
-        return 'Post-Short-Form'
-
-
-df['Era'] = df['Date'].apply(assign_era)
-
-# binary indicators
-df['Solo_Artist'] = (df['Artist Structure'] == 1).astype(int)
-df['Duo'] = (df['Artist Structure'] == 2).astype(int)
-df['Group'] = (df['Artist Structure'] == 0).astype(int)
-
-df['All_Male_Artist'] = (df['Artist Male'] == 1).astype(int)
-df['All_Female_Artist'] = (df['Artist Male'] == 0).astype(int)
-df['Mixed_Gender_Artist'] = (df['Artist Male'] == 2).astype(int)
-
-df['All_Male_Songwriter'] = (df['Songwriter Male'] == 1).astype(int)
-df['All_Female_Songwriter'] = (df['Songwriter Male'] == 0).astype(int)
-df['Mixed_Gender_Songwriter'] = (df['Songwriter Male'] == 2).astype(int)
-
-df['All_Male_Producer'] = (df['Producer Male'] == 1).astype(int)
-df['All_Female_Producer'] = (df['Producer Male'] == 0).astype(int)
-df['Mixed_Gender_Producer'] = (df['Producer Male'] == 2).astype(int)
-
-df['All_White_Artist'] = (df['Artist White'] == 1).astype(int)
-df['All_Black_Artist'] = (df['Artist Black'] == 1).astype(int)
-df['All_White_Songwriter'] = (df['Songwriter White'] == 1).astype(int)
-df['All_White_Producer'] = (df['Producer White'] == 1).astype(int)
+import numpy as np
+import pandas as pd
 
-pre_digital = df[df['Era'] == 'Pre-Digital']
-streaming = df[df['Era'] == 'Streaming']
-post_short = df[df['Era'] == 'Post-Short-Form']
-era_order = ['Pre-Digital', 'Streaming', 'Post-Short-Form']
+from aggregate import AggregationPlan
+from backends import BACKENDS, get_backend
+from boundaries import best_boundaries
+from cube import Cube
+from features import ERA_BOUNDARIES, ERA_NAMES, derive_features
+from ingest import compact_dtypes, iter_chunks, load_data, read_appended, read_source, tail_hash
+from instrument import Instrumentation, peak_rss_mb
+from resample import resample_era_changes
+from streaming import Moments, StreamingAnalysis, boxplot_stats_from_counts
+from timeseries import WeeklySeries, parse_trend_specs
 
-era_colors = {
-    'Pre-Digital': '#FF6B6B',
-    'Streaming': '#4ECDC4',
-    'Post-Short-Form': '#95E1D3'
-}
+warnings.filterwarnings('ignore')
 
-print("Creating visualizations for 4 research questions...")
-print(f"Dataset: {len(df)} songs from {df['Date'].min().date()} to {df['Date'].max().date()}\n")
-
-# SONG LENGTH
-
-print("song length analysis")
-
-fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-fig.suptitle('Song Length Across Consumption Eras', fontsize=14, fontweight='bold')
-
-# Box plot
-bp = axes[0].boxplot([pre_digital['Length (min)'].dropna(),
-                      streaming['Length (min)'].dropna(),
-                      post_short['Length (min)'].dropna()],
-                     labels=['Pre-Digital\n(1958-2006)', 'Streaming\n(2007-2019)', 'Post-Short-Form\n(2020-2025)'],
-                     patch_artist=True, showmeans=True, meanline=True)
-for patch, color in zip(bp['boxes'], era_colors.values()):
-    patch.set_facecolor(color)
-    patch.set_alpha(0.7)
-axes[0].set_ylabel('Song Length (minutes)', fontsize=11)
-axes[0].set_title('Distribution of Song Length by Era', fontsize=12)
-axes[0].grid(True, alpha=0.3, axis='y')
-
-# Add statistics text
-contingency = pd.crosstab(df['Era'], pd.cut(df['Length (min)'], bins=3, labels=['Short', 'Medium', 'Long']))
-chi2, p_val, dof, expected = chi2_contingency(contingency)
-axes[0].text(0.02, 0.98, f'χ² test: p={p_val:.4f}',
-             transform=axes[0].transAxes, fontsize=9, verticalalignment='top',
-             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-# Histogram showing distributions
-bins = np.linspace(df['Length (min)'].min(), df['Length (min)'].max(), 30)
-for era, color in era_colors.items():
-    era_data = df[df['Era'] == era]['Length (min)'].dropna()
-    axes[1].hist(era_data, bins=bins, alpha=0.5, label=era, color=color, edgecolor='black')
-axes[1].set_xlabel('Song Length (minutes)', fontsize=11)
-axes[1].set_ylabel('Frequency', fontsize=11)
-axes[1].set_title('Song Length Distribution by Era', fontsize=12)
-axes[1].legend()
-axes[1].grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.savefig('song_length.png', dpi=300, bbox_inches='tight')
-print("saved song_length.png")
-plt.close()
-
-# ARTIST STRUCTURE
-
-print("artist structure analysis")
-
-fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-fig.suptitle('Artist Structure Across Eras', fontsize=14, fontweight='bold')
-
-# Stacked bar chart
-structure_by_era = df.groupby('Era')[['Solo_Artist', 'Duo', 'Group']].mean() * 100
-structure_by_era = structure_by_era.reindex(era_order)
-structure_data = structure_by_era.T
-
-x = np.arange(len(era_order))
-width = 0.6
-axes[0].bar(x, structure_data.loc['Solo_Artist'], width, label='Solo',
-            color='#E74C3C', edgecolor='black', alpha=0.8)
-axes[0].bar(x, structure_data.loc['Duo'], width, bottom=structure_data.loc['Solo_Artist'],
-            label='Duo', color='#F39C12', edgecolor='black', alpha=0.8)
-axes[0].bar(x, structure_data.loc['Group'], width,
-            bottom=structure_data.loc['Solo_Artist'] + structure_data.loc['Duo'],
-            label='Group (3+)', color='#27AE60', edgecolor='black', alpha=0.8)
-axes[0].set_ylabel('Percentage', fontsize=11)
-axes[0].set_title('Artist Structure Distribution by Era', fontsize=12)
-axes[0].set_xticks(x)
-axes[0].set_xticklabels(['Pre-Digital\n(1958-2006)', 'Streaming\n(2007-2019)', 'Post-Short-Form\n(2020-2025)'],
-                        fontsize=9)
-axes[0].legend()
-axes[0].grid(True, alpha=0.3, axis='y')
-
-# Chi-square test
-contingency_solo = pd.crosstab(df['Era'], df['Solo_Artist'])
-chi2, p_val, dof, expected = chi2_contingency(contingency_solo)
-axes[0].text(0.02, 0.98, f'χ² test: p={p_val:.4f}',
-             transform=axes[0].transAxes, fontsize=9, verticalalignment='top',
-             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-# Grouped bar chart comparison
-x_pos = np.arange(len(era_order))
-bar_width = 0.25
-axes[1].bar(x_pos - bar_width, structure_by_era['Solo_Artist'], bar_width,
-            label='Solo', color='#E74C3C', edgecolor='black', alpha=0.8)
-axes[1].bar(x_pos, structure_by_era['Duo'], bar_width,
-            label='Duo', color='#F39C12', edgecolor='black', alpha=0.8)
-axes[1].bar(x_pos + bar_width, structure_by_era['Group'], bar_width,
-            label='Group (3+)', color='#27AE60', edgecolor='black', alpha=0.8)
-axes[1].set_ylabel('Percentage', fontsize=11)
-axes[1].set_title('Artist Structure Comparison', fontsize=12)
-axes[1].set_xticks(x_pos)
-axes[1].set_xticklabels(['Pre-Digital', 'Streaming', 'Post-Short-Form'], fontsize=9)
-axes[1].legend()
-axes[1].grid(True, alpha=0.3, axis='y')
-
-plt.tight_layout()
-plt.savefig('artist_structure.png', dpi=300, bbox_inches='tight')
-print("saved artist_structure.png")
-plt.close()
-
-# DEMOGRAPHICS
-
-print("demographics analysis")
-
-fig, axes = plt.subplots(2, 3, figsize=(16, 10))
-fig.suptitle('Racial & Gender Demographics Across Eras', fontsize=14, fontweight='bold')
-
-gender_by_era = df.groupby('Era')[['All_Male_Artist', 'All_Female_Artist', 'Mixed_Gender_Artist']].mean() * 100
-gender_by_era = gender_by_era.reindex(era_order)
-racial_by_era = df.groupby('Era')[['All_White_Artist', 'All_Black_Artist']].mean() * 100
-racial_by_era = racial_by_era.reindex(era_order)
-songwriter_gender_by_era = df.groupby('Era')[
-                               ['All_Male_Songwriter', 'All_Female_Songwriter', 'Mixed_Gender_Songwriter']].mean() * 100
-songwriter_gender_by_era = songwriter_gender_by_era.reindex(era_order)
-producer_gender_by_era = df.groupby('Era')[
-                             ['All_Male_Producer', 'All_Female_Producer', 'Mixed_Gender_Producer']].mean() * 100
-producer_gender_by_era = producer_gender_by_era.reindex(era_order)
-
-x = np.arange(len(era_order))
-width = 0.25
-
-# Artist Gender
-axes[0, 0].bar(x - width, gender_by_era['All_Male_Artist'], width, label='All Male',
-               color='#3498DB', edgecolor='black', alpha=0.8)
-axes[0, 0].bar(x, gender_by_era['All_Female_Artist'], width, label='All Female',
-               color='#E91E63', edgecolor='black', alpha=0.8)
-axes[0, 0].bar(x + width, gender_by_era['Mixed_Gender_Artist'], width, label='Mixed',
-               color='#9C27B0', edgecolor='black', alpha=0.8)
-axes[0, 0].set_ylabel('Percentage', fontsize=10)
-axes[0, 0].set_title('Artist Gender by Era', fontsize=11, fontweight='bold')
-axes[0, 0].set_xticks(x)
-axes[0, 0].set_xticklabels(['Pre-Digital', 'Streaming', 'Post-SF'], fontsize=9)
-axes[0, 0].legend(fontsize=8)
-axes[0, 0].grid(True, alpha=0.3, axis='y')
-
-# Artist Race
-axes[0, 1].bar(x - width / 2, racial_by_era['All_White_Artist'], width, label='All White',
-               color='#3498DB', edgecolor='black', alpha=0.8)
-axes[0, 1].bar(x + width / 2, racial_by_era['All_Black_Artist'], width, label='All Black',
-               color='#2ECC71', edgecolor='black', alpha=0.8)
-axes[0, 1].set_ylabel('Percentage', fontsize=10)
-axes[0, 1].set_title('Artist Race by Era', fontsize=11, fontweight='bold')
-axes[0, 1].set_xticks(x)
-axes[0, 1].set_xticklabels(['Pre-Digital', 'Streaming', 'Post-SF'], fontsize=9)
-axes[0, 1].legend(fontsize=8)
-axes[0, 1].grid(True, alpha=0.3, axis='y')
-
-# Songwriter Gender
-axes[0, 2].bar(x - width, songwriter_gender_by_era['All_Male_Songwriter'], width, label='All Male',
-               color='#3498DB', edgecolor='black', alpha=0.8)
-axes[0, 2].bar(x, songwriter_gender_by_era['All_Female_Songwriter'], width, label='All Female',
-               color='#E91E63', edgecolor='black', alpha=0.8)
-axes[0, 2].bar(x + width, songwriter_gender_by_era['Mixed_Gender_Songwriter'], width, label='Mixed',
-               color='#9C27B0', edgecolor='black', alpha=0.8)
-axes[0, 2].set_ylabel('Percentage', fontsize=10)
-axes[0, 2].set_title('Songwriter Gender by Era', fontsize=11, fontweight='bold')
-axes[0, 2].set_xticks(x)
-axes[0, 2].set_xticklabels(['Pre-Digital', 'Streaming', 'Post-SF'], fontsize=9)
-axes[0, 2].legend(fontsize=8)
-axes[0, 2].grid(True, alpha=0.3, axis='y')
-
-# Producer Gender
-axes[1, 0].bar(x - width, producer_gender_by_era['All_Male_Producer'], width, label='All Male',
-               color='#3498DB', edgecolor='black', alpha=0.8)
-axes[1, 0].bar(x, producer_gender_by_era['All_Female_Producer'], width, label='All Female',
-               color='#E91E63', edgecolor='black', alpha=0.8)
-axes[1, 0].bar(x + width, producer_gender_by_era['Mixed_Gender_Producer'], width, label='Mixed',
-               color='#9C27B0', edgecolor='black', alpha=0.8)
-axes[1, 0].set_ylabel('Percentage', fontsize=10)
-axes[1, 0].set_title('Producer Gender by Era', fontsize=11, fontweight='bold')
-axes[1, 0].set_xticks(x)
-axes[1, 0].set_xticklabels(['Pre-Digital', 'Streaming', 'Post-SF'], fontsize=9)
-axes[1, 0].legend(fontsize=8)
-axes[1, 0].grid(True, alpha=0.3, axis='y')
-
-# Decade-by-decade female representation comparison
-decade_data = df.groupby(df['Year'] // 10 * 10).agg({
-    'All_Female_Artist': 'mean',
-    'All_Female_Songwriter': 'mean',
-    'All_Female_Producer': 'mean'
-}) * 100
-
-axes[1, 1].plot(decade_data.index, decade_data['All_Female_Artist'],
-                marker='o', linewidth=2.5, markersize=8, label='Artist', color='#E91E63')
-axes[1, 1].plot(decade_data.index, decade_data['All_Female_Songwriter'],
-                marker='s', linewidth=2.5, markersize=8, label='Songwriter', color='#9C27B0')
-axes[1, 1].plot(decade_data.index, decade_data['All_Female_Producer'],
-                marker='^', linewidth=2.5, markersize=8, label='Producer', color='#673AB7')
-axes[1, 1].set_xlabel('Decade', fontsize=10)
-axes[1, 1].set_ylabel('Percentage', fontsize=10)
-axes[1, 1].set_title('All-Female Representation by Decade', fontsize=11, fontweight='bold')
-axes[1, 1].legend(fontsize=8)
-axes[1, 1].grid(True, alpha=0.3)
-
-# Decade-by-decade black representation
-decade_black = df.groupby(df['Year'] // 10 * 10)['All_Black_Artist'].mean() * 100
-axes[1, 2].bar(decade_black.index, decade_black.values, color='#2ECC71', edgecolor='black', alpha=0.8, width=8)
-axes[1, 2].set_xlabel('Decade', fontsize=10)
-axes[1, 2].set_ylabel('Percentage', fontsize=10)
-axes[1, 2].set_title('All-Black Artist Representation by Decade', fontsize=11, fontweight='bold')
-axes[1, 2].grid(True, alpha=0.3, axis='y')
-
-plt.tight_layout()
-plt.savefig('demographics.png', dpi=300, bbox_inches='tight')
-print("✓ Saved: demographics.png")
-plt.close()
-
-# CREATIVE CONTROL
-
-print("creative Control analysis")
-
-fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-fig.suptitle('Artist Creative Control Across Eras', fontsize=14, fontweight='bold')
-
-# Artist as Songwriter
-songwriter_data = df.groupby('Era')[['Artist is a Songwriter', 'Artist is Only Songwriter']].mean() * 100
-songwriter_data = songwriter_data.reindex(era_order)
-x = np.arange(len(era_order))
-width = 0.35
-axes[0].bar(x - width / 2, songwriter_data['Artist is a Songwriter'], width,
-            label='Co-Writes', color='#9B59B6', edgecolor='black', alpha=0.8)
-axes[0].bar(x + width / 2, songwriter_data['Artist is Only Songwriter'], width,
-            label='Only Writer', color='#3498DB', edgecolor='black', alpha=0.8)
-axes[0].set_ylabel('Percentage', fontsize=11)
-axes[0].set_title('Artist Songwriting by Era', fontsize=12)
-axes[0].set_xticks(x)
-axes[0].set_xticklabels(['Pre-Digital\n(1958-2006)', 'Streaming\n(2007-2019)', 'Post-Short-Form\n(2020-2025)'],
-                        fontsize=9)
-axes[0].legend()
-axes[0].grid(True, alpha=0.3, axis='y')
-
-# Chi-square test
-contingency_songwriter = pd.crosstab(df['Era'], df['Artist is a Songwriter'])
-chi2, p_val, dof, expected = chi2_contingency(contingency_songwriter)
-axes[0].text(0.02, 0.98, f'χ² test: p={p_val:.4f}',
-             transform=axes[0].transAxes, fontsize=9, verticalalignment='top',
-             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-# Artist as Producer
-producer_data = df.groupby('Era')[['Artist is a Producer', 'Artist is Only Producer']].mean() * 100
-producer_data = producer_data.reindex(era_order)
-axes[1].bar(x - width / 2, producer_data['Artist is a Producer'], width,
-            label='Co-Produces', color='#E67E22', edgecolor='black', alpha=0.8)
-axes[1].bar(x + width / 2, producer_data['Artist is Only Producer'], width,
-            label='Only Producer', color='#E74C3C', edgecolor='black', alpha=0.8)
-axes[1].set_ylabel('Percentage', fontsize=11)
-axes[1].set_title('Artist Production by Era', fontsize=12)
-axes[1].set_xticks(x)
-axes[1].set_xticklabels(['Pre-Digital\n(1958-2006)', 'Streaming\n(2007-2019)', 'Post-Short-Form\n(2020-2025)'],
-                        fontsize=9)
-axes[1].legend()
-axes[1].grid(True, alpha=0.3, axis='y')
-
-# Chi-square test
-contingency_producer = pd.crosstab(df['Era'], df['Artist is a Producer'])
-chi2, p_val, dof, expected = chi2_contingency(contingency_producer)
-axes[1].text(0.02, 0.98, f'χ² test: p={p_val:.4f}',
-             transform=axes[1].transAxes, fontsize=9, verticalalignment='top',
-             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-plt.tight_layout()
-plt.savefig('creative_control.png', dpi=300, bbox_inches='tight')
-print("creative_control.png")
-plt.close()
-
-# GENRE EVOLUTION
-print("genre evolution analysis")
-
-# Top genres overall
-top_genres = df['Discogs Genre'].value_counts().head(10).index
-
-genre_by_era = pd.crosstab(df['Era'], df['Discogs Genre'], normalize='index') * 100
-genre_by_era = genre_by_era[top_genres].reindex(era_order)
-
-fig, ax = plt.subplots(figsize=(14, 8))
-x = np.arange(len(top_genres))
-width = 0.25
-
-for i, era in enumerate(era_order):
-    offset = width * (i - 1)
-    ax.bar(x + offset, genre_by_era.loc[era], width, label=era,
-           color=list(era_colors.values())[i], edgecolor='black', alpha=0.8)
-
-ax.set_xlabel('Genre', fontsize=12)
-ax.set_ylabel('Percentage of #1 Hits', fontsize=12)
-ax.set_title('Genre Distribution Across Eras', fontsize=14, fontweight='bold')
-ax.set_xticks(x)
-ax.set_xticklabels(top_genres, rotation=45, ha='right')
-ax.legend()
-ax.grid(True, alpha=0.3, axis='y')
-plt.tight_layout()
-plt.savefig('genre_by_era.png', dpi=300, bbox_inches='tight')
-print("saved genre_by_era.png")
-plt.close()
-
-# MAGNITUDE OF CHANGE
-
-print("magnitude of change analysis")
+DEFAULT_PATH = r'C:\Users\justi\Downloads\Billboard_Hot_100_Data.csv'
 
 metrics = {
     'Song Length (min)': 'Length (min)',
@@ -388,117 +37,920 @@ metrics = {
     'Artist Only Writes (%)': 'Artist is Only Songwriter'
 }
 
-changes_pre_to_stream = {}
-changes_stream_to_post = {}
-changes_pre_to_post = {}
-
-for label, col in metrics.items():
-    pre_val = pre_digital[col].mean()
-    stream_val = streaming[col].mean()
-    post_val = post_short[col].mean()
 
-    if '%' in label:
-        changes_pre_to_stream[label] = (stream_val - pre_val) * 100
-        changes_stream_to_post[label] = (post_val - stream_val) * 100
-        changes_pre_to_post[label] = (post_val - pre_val) * 100
+def change_pairs(names=ERA_NAMES):
+    """Era pairs compared in the magnitude-of-change analysis: label -> (from era, to era)."""
+    first, middle, last = names
+    return {
+        f'{first} → {middle}': (first, middle),
+        f'{middle} → {last}': (middle, last),
+        f'{first} → {last} (Total)': (first, last),
+    }
+
+
+def era_labels(boundaries, names, first_year, last_year):
+    """Tick labels naming each era and its span of years, e.g. 'Streaming\\n(2007-2019)'."""
+    starts = [first_year, *boundaries]
+    ends = [year - 1 for year in boundaries] + [last_year]
+    return [f'{name}\n({start}-{end})' for name, start, end in zip(names, starts, ends)]
+
+
+def build_plan(resample=False, sweep=False):
+    # every grouped statistic the figures need, computed with one groupby per key
+    plan = AggregationPlan()
+    plan.add('Era', ['Solo_Artist', 'Duo', 'Group',
+                     'All_Male_Artist', 'All_Female_Artist', 'Mixed_Gender_Artist',
+                     'All_White_Artist', 'All_Black_Artist',
+                     'All_Male_Songwriter', 'All_Female_Songwriter', 'Mixed_Gender_Songwriter',
+                     'All_Male_Producer', 'All_Female_Producer', 'Mixed_Gender_Producer',
+                     'Artist is a Songwriter', 'Artist is Only Songwriter',
+                     'Artist is a Producer', 'Artist is Only Producer'])
+    plan.add('Era', metrics.values())
+    plan.add_split('Era', 'Length (min)')
+    plan.add('Decade', ['All_Female_Artist', 'All_Female_Songwriter', 'All_Female_Producer', 'All_Black_Artist'])
+    plan.add('Year', ['Length (min)', 'All_Male_Artist', 'All_Female_Artist', 'Artist is a Songwriter',
+                      'Solo_Artist', 'Group'])
+    plan.add_size('Year')
+    if sweep:
+        # per-year moments of every metric for the boundary search
+        plan.add('Year', metrics.values())
+    if resample:
+        # raw per-era values for the bootstrap / permutation tests
+        for col in metrics.values():
+            plan.add_split('Era', col)
+    return plan
+
+
+# era x outcome tables for the chi-square tests of independence from era
+CONTINGENCY_COLS = {
+    'solo': 'Solo_Artist',
+    'songwriter': 'Artist is a Songwriter',
+    'producer': 'Artist is a Producer',
+}
+LENGTH_CLASSES = ['Short', 'Medium', 'Long']
+LENGTH_BINS = 30
+
+
+def era_contingency(df, backend=None):
+    backend = backend or get_backend()
+    tables = {'length': backend.crosstab(df, 'Era', 'Length (min)', bins=3, labels=LENGTH_CLASSES)}
+    for name, col in CONTINGENCY_COLS.items():
+        tables[name] = backend.crosstab(df, 'Era', col)
+    return tables
+
+
+def chi2_contingency(observed):
+    """(chi2, p, dof, expected) as scipy.stats.chi2_contingency, without importing scipy.stats.
+
+    scipy.stats takes most of a second to import; scipy.special's chi-square tail is all
+    the test needs. Yates' correction is applied for 2x2 tables, as scipy does.
+    """
+    from scipy.special import chdtrc
+
+    observed = np.asarray(observed, dtype='float64')
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / observed.sum()
+    dof = expected.size - sum(expected.shape) + expected.ndim - 1
+    if dof == 0:
+        return 0.0, 1.0, 0, expected
+    if dof == 1:
+        diff = expected - observed
+        observed = observed + np.minimum(0.5, np.abs(diff)) * np.sign(diff)
+    chi2 = ((observed - expected) ** 2 / expected).sum()
+    return chi2, chdtrc(dof, chi2), dof, expected
+
+
+def era_tests(tables):
+    p_values = {}
+    for name, table in tables.items():
+        chi2, p_val, dof, expected = chi2_contingency(table)
+        p_values[name] = p_val
+    return p_values
+
+
+def length_distribution(length_by_era, lo, hi, names=ERA_NAMES):
+    """Box plot stats and histogram counts per era from the raw song lengths (minutes)."""
+    bins = np.linspace(lo, hi, LENGTH_BINS)
+    return {
+        'box_stats': [boxplot_stats_from_counts(*np.unique(length_by_era[era], return_counts=True))
+                      for era in names],
+        'bins': bins,
+        'hist': {era: np.histogram(length_by_era[era], bins=bins)[0] for era in names},
+    }
+
+
+def length_distribution_from_hist(hist, names=ERA_NAMES):
+    """length_distribution() rebuilt from a per-era song-length Histogram (seconds)."""
+    lengths = {era: hist.group(era) for era in names}
+    lo, hi = (v / 60 for v in hist.range())
+    bins = np.linspace(lo, hi, LENGTH_BINS)
+    return {
+        'box_stats': [boxplot_stats_from_counts(values / 60, counts) for values, counts in lengths.values()],
+        'bins': bins,
+        'hist': {era: np.histogram(values / 60, bins=bins, weights=counts)[0].astype(np.int64)
+                 for era, (values, counts) in lengths.items()},
+    }
+
+
+def length_contingency_from_hist(hist):
+    """The pd.cut(bins=3) length class x era table, rebuilt from a song-length Histogram."""
+    lo, hi = (v / 60 for v in hist.range())
+    edges = np.linspace(lo, hi, 4)
+    edges[0] -= (hi - lo) * 0.001  # same widening of the first edge as pd.cut
+    rows = {}
+    for era in sorted(hist.counts):
+        values, counts = hist.group(era)
+        classes = np.clip(np.searchsorted(edges, values / 60, side='left') - 1, 0, 2)
+        rows[era] = np.bincount(classes, weights=counts, minlength=3).astype(np.int64)
+    table = pd.DataFrame.from_dict(rows, orient='index', columns=LENGTH_CLASSES)
+    return table.loc[:, table.sum() > 0]
+
+
+def genre_shares(counts, top=10, names=ERA_NAMES):
+    """% of each era's hits in the overall top genres, from an era x genre count table."""
+    top_genres = counts.sum().sort_values(ascending=False, kind='stable').head(top).index
+    genre_by_era = counts.div(counts.sum(axis=1), axis=0) * 100
+    return genre_by_era[top_genres].reindex(names)
+
+
+# multi-valued Discogs fields, counted per label rather than per distinct string
+LABEL_COLS = {'genre': 'Discogs Genre', 'style': 'Discogs Style'}
+
+
+def label_tables(labels, top=15, pairs=20, names=ERA_NAMES):
+    """Per-era label shares and the most common style pairs, from {name: LabelCounts}."""
+    return {
+        'genre_labels_by_era': labels['genre'].shares(top=10).reindex(names),
+        'style_by_era': labels['style'].shares(top=top).reindex(names),
+        'style_pairs': labels['style'].top_pairs(pairs),
+    }
+
+
+def magnitude_of_change(aggs, names=ERA_NAMES):
+    era_means = aggs.table('Era', metrics.values()).reindex(names)
+    changes = {}
+    for pair, (before, after) in change_pairs(names).items():
+        diff = era_means.loc[after] - era_means.loc[before]
+        # percentage points for the 0/1 metrics
+        changes[pair] = {label: diff[col] * 100 if '%' in label else diff[col] for label, col in metrics.items()}
+    return pd.DataFrame(changes)
+
+
+def era_change_cis(aggs, n_resamples, seed=0, jobs=1, names=ERA_NAMES):
+    """Bootstrap CIs and permutation p-values for every cell of magnitude_of_change()."""
+    groups = {label: aggs.split('Era', col) for label, col in metrics.items()}
+    ci = resample_era_changes(groups, change_pairs(names), n_resamples, seed=seed, jobs=jobs)
+    # same units as magnitude_of_change(): percentage points for the % metrics
+    pct = ci.index.get_level_values('metric').str.contains('%', regex=False)
+    ci.loc[pct, ['diff', 'ci_low', 'ci_high']] *= 100
+    return ci
+
+
+def figure_inputs(aggs, tests, length, genre_by_era, ci=None, boundaries=ERA_BOUNDARIES, names=ERA_NAMES):
+    """The precomputed tables each figure is drawn from, keyed by figure name."""
+
+    def by_era(cols):
+        return (aggs.table('Era', cols) * 100).reindex(names)
+
+    def by_year(col):
+        return aggs.table('Year', [col])[col]
+
+    years = aggs.size('Year').index
+    labels = era_labels(boundaries, names, int(years.min()), int(years.max()))
+
+    return {
+        'song_length': {
+            **length,
+            'era_labels': labels,
+            'p_value': tests['length'],
+        },
+        'artist_structure': {
+            'structure_by_era': by_era(['Solo_Artist', 'Duo', 'Group']),
+            'era_labels': labels,
+            'p_value': tests['solo'],
+        },
+        'demographics': {
+            'gender_by_era': by_era(['All_Male_Artist', 'All_Female_Artist', 'Mixed_Gender_Artist']),
+            'racial_by_era': by_era(['All_White_Artist', 'All_Black_Artist']),
+            'songwriter_gender_by_era': by_era(
+                ['All_Male_Songwriter', 'All_Female_Songwriter', 'Mixed_Gender_Songwriter']),
+            'producer_gender_by_era': by_era(['All_Male_Producer', 'All_Female_Producer', 'Mixed_Gender_Producer']),
+            'decade_data': aggs.table(
+                'Decade', ['All_Female_Artist', 'All_Female_Songwriter', 'All_Female_Producer']) * 100,
+            'decade_black': aggs.table('Decade', ['All_Black_Artist'])['All_Black_Artist'] * 100,
+        },
+        'creative_control': {
+            'songwriter_data': by_era(['Artist is a Songwriter', 'Artist is Only Songwriter']),
+            'producer_data': by_era(['Artist is a Producer', 'Artist is Only Producer']),
+            'era_labels': labels,
+            'songwriter_p_value': tests['songwriter'],
+            'producer_p_value': tests['producer'],
+        },
+        'genre_by_era': {
+            'genre_by_era': genre_by_era,
+        },
+        'era_changes': {
+            'change_df': magnitude_of_change(aggs, names),
+            'ci': ci,
+        },
+        'era_comparison': {
+            'boundaries': list(boundaries),
+            'yearly_length': by_year('Length (min)'),
+            'yearly_male': by_year('All_Male_Artist') * 100,
+            'yearly_female': by_year('All_Female_Artist') * 100,
+            'yearly_songwriter': by_year('Artist is a Songwriter') * 100,
+            'yearly_solo': by_year('Solo_Artist') * 100,
+            'yearly_group': by_year('Group') * 100,
+            'yearly_count': aggs.size('Year'),
+        },
+    }
+
+
+# weekly trend series: every metric plus the group share drawn in the era comparison
+TREND_COLS = list(dict.fromkeys([*metrics.values(), 'Group']))
+
+
+def trend_lines(trends):
+    """The era-comparison panels' series from the first trend window, on a fractional-year axis."""
+    window = trends.columns.get_level_values('window')[0]
+    frame = trends[window]
+    years = frame.index.year + (frame.index.dayofyear - 1) / 365.25
+
+    def line(col, scale=1):
+        return pd.Series(frame[col].to_numpy() * scale, index=years)
+
+    if window.startswith('ewm'):
+        label = f'EWMA, {window[3:-1]}-week half-life'
     else:
-        changes_pre_to_stream[label] = stream_val - pre_val
-        changes_stream_to_post[label] = post_val - stream_val
-        changes_pre_to_post[label] = post_val - pre_val
-
-change_df = pd.DataFrame({
-    'Pre-Digital → Streaming': changes_pre_to_stream,
-    'Streaming → Post-Short-Form': changes_stream_to_post,
-    'Pre-Digital → Post-Short-Form (Total)': changes_pre_to_post
-})
-
-# Visualize changes
-fig, ax = plt.subplots(figsize=(14, 8))
-change_df.plot(kind='barh', ax=ax, color=['#FF6B6B', '#4ECDC4', '#95E1D3'], edgecolor='black', width=0.7)
-ax.axvline(0, color='black', linewidth=1)
-ax.set_xlabel('Change in Metric', fontsize=12)
-ax.set_title('Magnitude of Change Between Eras', fontsize=14, fontweight='bold')
-ax.legend(loc='best')
-ax.grid(True, alpha=0.3, axis='x')
-plt.tight_layout()
-plt.savefig('era_changes.png', dpi=300, bbox_inches='tight')
-print("saved era_changes.png")
-plt.close()
-
-# ERA COMPARISON
-print("comprehensive era comparison")
-
-fig = plt.figure(figsize=(16, 12))
-gs = fig.add_gridspec(3, 2, hspace=0.3, wspace=0.3)
-
-# 1. Song Length Over Time
-ax1 = fig.add_subplot(gs[0, :])
-yearly_length = df.groupby('Year')['Length (min)'].mean()
-ax1.plot(yearly_length.index, yearly_length.values, linewidth=2, color='#2C3E50', marker='o', markersize=3)
-ax1.axvline(2007, color='red', linestyle='--', linewidth=2, alpha=0.7, label='Era boundaries')
-ax1.axvline(2020, color='red', linestyle='--', linewidth=2, alpha=0.7)
-ax1.set_xlabel('Year', fontsize=11)
-ax1.set_ylabel('Average Song Length (minutes)', fontsize=11)
-ax1.set_title('Song Length Evolution', fontsize=13, fontweight='bold')
-ax1.legend()
-ax1.grid(True, alpha=0.3)
-
-# 2. Artist Gender Distribution
-ax2 = fig.add_subplot(gs[1, 0])
-yearly_male = df.groupby('Year')['All_Male_Artist'].mean() * 100
-yearly_female = df.groupby('Year')['All_Female_Artist'].mean() * 100
-ax2.plot(yearly_male.index, yearly_male.values, linewidth=2, label='All Male', color='#3498DB', marker='o',
-         markersize=3)
-ax2.plot(yearly_female.index, yearly_female.values, linewidth=2, label='All Female', color='#E91E63', marker='o',
-         markersize=3)
-ax2.axvline(2007, color='red', linestyle='--', linewidth=2, alpha=0.7)
-ax2.axvline(2020, color='red', linestyle='--', linewidth=2, alpha=0.7)
-ax2.set_xlabel('Year', fontsize=11)
-ax2.set_ylabel('Percentage', fontsize=11)
-ax2.set_title('Artist Gender Distribution Over Time', fontsize=12, fontweight='bold')
-ax2.legend()
-ax2.grid(True, alpha=0.3)
-
-# 3. Artist as Songwriter
-ax3 = fig.add_subplot(gs[1, 1])
-yearly_songwriter = df.groupby('Year')['Artist is a Songwriter'].mean() * 100
-ax3.plot(yearly_songwriter.index, yearly_songwriter.values, linewidth=2.5, color='#9B59B6', marker='o', markersize=3)
-ax3.axvline(2007, color='red', linestyle='--', linewidth=2, alpha=0.7)
-ax3.axvline(2020, color='red', linestyle='--', linewidth=2, alpha=0.7)
-ax3.set_xlabel('Year', fontsize=11)
-ax3.set_ylabel('Percentage', fontsize=11)
-ax3.set_title('Artists Co-Writing Their Songs', fontsize=12, fontweight='bold')
-ax3.grid(True, alpha=0.3)
-
-# 4. Solo vs Group
-ax4 = fig.add_subplot(gs[2, 0])
-yearly_solo = df.groupby('Year')['Solo_Artist'].mean() * 100
-yearly_group = df.groupby('Year')['Group'].mean() * 100
-ax4.plot(yearly_solo.index, yearly_solo.values, linewidth=2.5, color='#E74C3C', marker='o', markersize=3, label='Solo')
-ax4.plot(yearly_group.index, yearly_group.values, linewidth=2.5, color='#27AE60', marker='o', markersize=3,
-         label='Group')
-ax4.axvline(2007, color='red', linestyle='--', linewidth=2, alpha=0.7)
-ax4.axvline(2020, color='red', linestyle='--', linewidth=2, alpha=0.7)
-ax4.set_xlabel('Year', fontsize=11)
-ax4.set_ylabel('Percentage', fontsize=11)
-ax4.set_title('Solo vs Group Artists Over Time', fontsize=12, fontweight='bold')
-ax4.legend()
-ax4.grid(True, alpha=0.3)
-
-# 5. Number of Different #1 Hits Per Year
-ax5 = fig.add_subplot(gs[2, 1])
-yearly_count = df.groupby('Year').size()
-ax5.bar(yearly_count.index, yearly_count.values, alpha=0.7, color='teal', edgecolor='black')
-ax5.axvline(2007, color='red', linestyle='--', linewidth=2, alpha=0.7)
-ax5.axvline(2020, color='red', linestyle='--', linewidth=2, alpha=0.7)
-ax5.set_xlabel('Year', fontsize=11)
-ax5.set_ylabel('Count', fontsize=11)
-ax5.set_title('Number of Different #1 Hits Per Year', fontsize=12, fontweight='bold')
-ax5.grid(True, alpha=0.3, axis='y')
-
-plt.suptitle('Billboard Hot 100: Comprehensive Era Comparison', fontsize=16, fontweight='bold', y=0.995)
-plt.savefig('era_comparison.png', dpi=300, bbox_inches='tight')
-print("saved era_comparison.png")
-plt.close()
-
-print("success")
\ No newline at end of file
+        label = f'{window[:-1]}-week rolling mean'
+    return {
+        'label': label + ' weighted by weeks at #1',
+        'length': line('Length (min)'),
+        'male': line('All_Male_Artist', 100),
+        'female': line('All_Female_Artist', 100),
+        'songwriter': line('Artist is a Songwriter', 100),
+        'solo': line('Solo_Artist', 100),
+        'group': line('Group', 100),
+    }
+
+
+def _add_trends(inputs, weekly, trend):
+    trends = weekly.trends(trend)
+    inputs['era_comparison']['trend'] = trend_lines(trends)
+    inputs['trends'] = trends
+    return inputs
+
+
+def analyze(df, n_resamples=0, seed=0, jobs=1, inst=None, trend=None, boundaries=ERA_BOUNDARIES, names=ERA_NAMES,
+            backend=None):
+    """In-memory path: (aggregates, figure inputs) for a frame featured with these eras.
+
+    With n_resamples, the era changes also get bootstrap CIs and permutation p-values.
+    With trend (window specs, see timeseries.parse_trend_specs), the yearly panels get
+    weekly trend lines and inputs['trends'] holds every window's weekly series.
+    backend: the backends.py backend df belongs to (default pandas).
+    """
+    inst = inst or Instrumentation()
+    backend = backend or get_backend()
+    rows = backend.count(df)
+    with inst.span('aggregation', rows=rows):
+        aggs = backend.aggregate(df, build_plan(resample=n_resamples > 0))
+    with inst.span('statistics', rows=rows):
+        length = length_distribution(aggs.split('Era', 'Length (min)'), *backend.range(df, 'Length (min)'), names)
+        genre_by_era = genre_shares(backend.crosstab(df, 'Era', 'Discogs Genre'), names=names)
+        with inst.span('chi2_tests'):
+            tests = era_tests(era_contingency(df, backend))
+    ci = None
+    if n_resamples:
+        with inst.span('bootstrap', rows=rows):
+            ci = era_change_cis(aggs, n_resamples, seed, jobs, names)
+    with inst.span('labels', rows=rows):
+        # scipy.sparse is only imported by the commands that build the label tables from rows
+        from multilabel import LabelCounts
+
+        label_rows = backend.rows(df, ['Era', *LABEL_COLS.values()])
+        labels = label_tables({name: LabelCounts(col).update(label_rows) for name, col in LABEL_COLS.items()},
+                              names=names)
+    inputs = {**figure_inputs(aggs, tests, length, genre_by_era, ci, boundaries, names), 'labels': labels}
+    if trend:
+        with inst.span('trends', rows=rows):
+            weekly = WeeklySeries(TREND_COLS).update(backend.rows(df, ['Date', 'Weeks at Number One', *TREND_COLS]))
+            _add_trends(inputs, weekly, trend)
+    return aggs, inputs
+
+
+def analyze_stream(chunks, sweep=False, inst=None, trend=None, boundaries=ERA_BOUNDARIES, names=ERA_NAMES):
+    """Chunked path: the same outputs as analyze() from an iterable of featured chunks.
+
+    Memory is bounded by the number of groups, not rows. Song lengths are accumulated on
+    whole-second bins, which is exact for this data (lengths are recorded in seconds).
+    """
+    from multilabel import LabelCounts
+
+    inst = inst or Instrumentation()
+    acc = StreamingAnalysis(build_plan(sweep=sweep), CONTINGENCY_COLS)
+    labels = {name: LabelCounts(col) for name, col in LABEL_COLS.items()}
+    weekly = WeeklySeries(TREND_COLS) if trend else None
+    # reading, feature derivation and accumulation are interleaved chunk by chunk
+    with inst.span('stream') as span:
+        for chunk in chunks:
+            acc.update(chunk)
+            for counts in labels.values():
+                counts.update(chunk)
+            if weekly is not None:
+                weekly.update(chunk)
+        span['rows'] = acc.rows
+
+    with inst.span('statistics', rows=acc.rows):
+        aggs = acc.aggregates()
+        tables = {'length': length_contingency_from_hist(acc.length)}
+        tables.update({name: crosstab.table() for name, crosstab in acc.crosstabs.items()})
+        with inst.span('chi2_tests'):
+            tests = era_tests(tables)
+        inputs = figure_inputs(aggs, tests, length_distribution_from_hist(acc.length, names),
+                               genre_shares(acc.genre.table(), names=names), boundaries=boundaries, names=names)
+        inputs['labels'] = label_tables(labels, names=names)
+        if trend:
+            _add_trends(inputs, weekly, trend)
+    return acc, aggs, inputs
+
+
+def analyze_cube(cube, inst=None):
+    """Cube path: the same outputs as analyze(), answered from a Cube's cells (and its eras)."""
+    inst = inst or Instrumentation()
+    with inst.span('statistics', rows=cube.cells):
+        aggs = cube.aggregates(build_plan())
+        length = cube.length_histogram('Era')
+        tables = {'length': length_contingency_from_hist(length)}
+        tables.update({name: cube.crosstab('Era', col) for name, col in CONTINGENCY_COLS.items()})
+        with inst.span('chi2_tests'):
+            tests = era_tests(tables)
+        inputs = figure_inputs(aggs, tests, length_distribution_from_hist(length, cube.names),
+                               genre_shares(cube.crosstab('Era', 'Discogs Genre'), names=cube.names),
+                               boundaries=cube.boundaries, names=cube.names)
+    return aggs, inputs
+
+
+def build_cube(path, chunksize=None, inst=None):
+    """A Cube of the chart CSV at path, read whole (through the cache) or in chunks."""
+    inst = inst or Instrumentation()
+    cube = Cube()
+    size = os.path.getsize(path)
+    cube.source = {'path': os.path.abspath(path), 'offset': size, 'tail': tail_hash(path, size)}
+    if chunksize:
+        with inst.span('stream') as span:
+            for chunk in iter_chunks(path, chunksize):
+                cube.update(derive_features(chunk))
+            span['rows'] = cube.rows
+        return cube
+    with inst.span('ingest') as span:
+        df = load_data(path)
+        span['rows'] = len(df)
+    with inst.span('features', rows=len(df)):
+        df = derive_features(df)
+    with inst.span('cube', rows=len(df)):
+        cube.update(df)
+    return cube
+
+
+def append_rows(cube, path, boundaries=ERA_BOUNDARIES, names=ERA_NAMES, inst=None):
+    """Add the rows of the chart CSV at path that cube doesn't hold yet; returns them, featured.
+
+    If path is the CSV the cube was built from and it has only grown since, just the bytes
+    after the last read are parsed. Any other file (e.g. one with only the new weeks) is read
+    whole, and only its rows dated after the cube's last date are added.
+    """
+    inst = inst or Instrumentation()
+    with inst.span('ingest') as span:
+        source = cube.source
+        size = os.path.getsize(path)
+        if source and source['path'] == os.path.abspath(path):
+            if size < source['offset'] or tail_hash(path, source['offset']) != source['tail']:
+                raise ValueError(f"{path} was changed before byte {source['offset']}, not just appended to; "
+                                 f"rebuild the state with the cube command")
+            new = read_appended(path, source['offset'], size)
+            cube.source = dict(source, offset=size, tail=tail_hash(path, size))
+        else:
+            new = read_source(path)
+            if cube.last_date is not None:
+                new = new[new['Date'] > cube.last_date]
+        span['rows'] = len(new)
+    if len(new):
+        with inst.span('features', rows=len(new)):
+            new = derive_features(new, boundaries, names)
+        with inst.span('cube', rows=len(new)):
+            cube.update(new)
+    return new
+
+
+def is_cube(path):
+    return path.endswith('.npz')
+
+
+def load_snapshot(path):
+    """(cube, stats tables) for the query service, from a chart CSV or a saved cube."""
+    cube = Cube.load(path) if is_cube(path) else build_cube(path)
+    aggs, inputs = analyze_cube(cube)
+    return cube, stats_tables(inputs)
+
+
+def boundary_sweep(year_moments, min_years=3, current=ERA_BOUNDARIES):
+    """Best single/double era boundaries per metric, from per-year moments."""
+    return best_boundaries(year_moments, metrics, current=tuple(current), min_years=min_years)
+
+
+def stats_tables(inputs):
+    """The numbers behind the figures as plain tables, keyed by name."""
+    tables = {'p_values': pd.Series({
+        'song length': inputs['song_length']['p_value'],
+        'solo artist': inputs['artist_structure']['p_value'],
+        'artist is a songwriter': inputs['creative_control']['songwriter_p_value'],
+        'artist is a producer': inputs['creative_control']['producer_p_value'],
+    }, name='chi2 p-value')}
+    for figure in ('artist_structure', 'demographics', 'creative_control', 'genre_by_era', 'era_changes'):
+        for name, value in inputs[figure].items():
+            if isinstance(value, (pd.DataFrame, pd.Series)):
+                tables[name] = value
+    yearly = inputs['era_comparison']
+    tables['yearly'] = pd.DataFrame({name: yearly[name] for name in yearly if name.startswith('yearly_')})
+    # per-label Discogs tables need the rows' genre/style strings, so a cube has none
+    tables.update(inputs.get('labels', {}))
+    return tables
+
+
+def differences(a, b, where='', rtol=1e-12):
+    """[(where, how)] for every table, array or value that differs between two figure-input trees.
+
+    Floats may differ by rtol: backends sum the groups in different orders.
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        out = [(f'{where}/{key}', 'only in one') for key in [*a, *b] if (key in a) != (key in b)]
+        for key in a:
+            if key in b:
+                out += differences(a[key], b[key], f'{where}/{key}', rtol)
+        return out
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)) and len(a) == len(b):
+        return [d for i, (x, y) in enumerate(zip(a, b)) for d in differences(x, y, f'{where}[{i}]', rtol)]
+    if isinstance(a, (pd.DataFrame, pd.Series)):
+        check = pd.testing.assert_frame_equal if isinstance(a, pd.DataFrame) else pd.testing.assert_series_equal
+        try:
+            check(a, b, check_exact=False, rtol=rtol, atol=0)
+        except AssertionError as e:
+            return [(where, ' '.join(str(e).split()))]
+        return []
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        same = np.shape(a) == np.shape(b) and (np.allclose(a, b, rtol=rtol, atol=0, equal_nan=True)
+                                               if np.asarray(a).dtype.kind == 'f' else np.array_equal(a, b))
+        return [] if same else [(where, f'{a!r} != {b!r}')]
+    if isinstance(a, float) and isinstance(b, float):
+        same = np.isclose(a, b, rtol=rtol, atol=0, equal_nan=True)
+    else:
+        same = a == b
+    return [] if same else [(where, f'{a!r} != {b!r}')]
+
+
+def compare_backends(path, backends=('pandas', 'polars'), trend=None, boundaries=ERA_BOUNDARIES, names=ERA_NAMES):
+    """Analyse path in memory with each backend: [(backend, seconds, differences from the first backend)]."""
+    results = []
+    for name in backends:
+        start = time.perf_counter()
+        backend = get_backend(name)
+        df = backend.features(backend.load(path), boundaries, names)
+        aggs, inputs = analyze(df, trend=trend, boundaries=boundaries, names=names, backend=backend)
+        results.append((name, time.perf_counter() - start, inputs))
+    reference = results[0][2]
+    return [(name, seconds, differences(reference, inputs)) for name, seconds, inputs in results]
+
+
+def _to_json(tables):
+    return {name: json.loads(table.to_json(orient='split')) for name, table in tables.items()}
+
+
+# figure names as in figures.FIGURES, listed here so the CLI can validate them without
+# importing matplotlib
+FIGURE_NAMES = ['song_length', 'artist_structure', 'demographics', 'creative_control',
+                'genre_by_era', 'era_changes', 'era_comparison']
+# output profiles as in figures.PROFILES
+OUTPUT_PROFILES = ['final', 'preview', 'svg', 'pdf']
+COMMANDS = ['all', 'stats', 'render', 'cube', 'append', 'serve', 'batch', 'compare-backends']
+
+
+def _figure_list(value):
+    names = FIGURE_NAMES if value == 'all' else value.split(',')
+    unknown = [name for name in names if name not in FIGURE_NAMES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown figure {', '.join(unknown)} (choose from {', '.join(FIGURE_NAMES)})")
+    return names
+
+
+def _era_years(value):
+    try:
+        years = [int(year) for year in value.split(',')]
+    except ValueError:
+        years = []
+    if len(years) != len(ERA_BOUNDARIES) or years != sorted(set(years)):
+        raise argparse.ArgumentTypeError(f'expected {len(ERA_BOUNDARIES)} increasing years like 2007,2020, got {value!r}')
+    return years
+
+
+def _era_names(value):
+    names = [name.strip() for name in value.split(',')]
+    if len(names) != len(ERA_NAMES) or not all(names) or len(set(names)) != len(names):
+        raise argparse.ArgumentTypeError(f'expected {len(ERA_NAMES)} distinct era names, got {value!r}')
+    return names
+
+
+def _backend_list(value):
+    names = value.split(',')
+    unknown = [name for name in names if name not in BACKENDS]
+    if unknown or len(names) < 2:
+        raise argparse.ArgumentTypeError(f"expected two or more of {', '.join(BACKENDS)}, got {value!r}")
+    return names
+
+
+def _trend_specs(value):
+    try:
+        return parse_trend_specs(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _add_output_args(parser):
+    parser.add_argument('--out-dir', default='.', help='where to write figures and tables')
+    parser.add_argument('--eras', type=_era_years, default=list(ERA_BOUNDARIES), metavar='YEAR,YEAR',
+                        help=f"first years of the second and third era (default {','.join(map(str, ERA_BOUNDARIES))})")
+    parser.add_argument('--era-names', type=_era_names, default=list(ERA_NAMES), metavar='NAME,NAME,NAME',
+                        help=f"names of the three eras (default {','.join(ERA_NAMES)})")
+
+
+def _add_common_args(parser):
+    parser.add_argument('path', nargs='?', default=os.environ.get('BILLBOARD_DATA', DEFAULT_PATH),
+                        help='chart CSV or a saved .npz cube (default: $BILLBOARD_DATA or the original download location)')
+    _add_output_args(parser)
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='worker processes for rendering/resampling')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='stream the CSV in chunks of N rows instead of loading it whole')
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help='bootstrap CIs and permutation p-values for the era changes with N resamples')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for --bootstrap')
+    parser.add_argument('--sweep-boundaries', action='store_true',
+                        help='score every candidate era boundary year (and pair) for each metric')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='write per-stage wall/CPU time, memory and row counts to a JSON report')
+    parser.add_argument('--trend', type=_trend_specs, metavar='WINDOWS',
+                        help='weekly trends weighted by weeks at #1, e.g. 26,104,ewm52 (rolling weeks or '
+                             'EWMA half-life); the first one is drawn in era_comparison')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='pandas',
+                        help='dataframe engine for whole-file loads: eager pandas or lazy, multithreaded polars')
+    parser.add_argument('--compact', action='store_true',
+                        help='keep text as categoricals and numbers in the smallest exact dtypes '
+                             '(whole-file loads), and report the memory saved')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='with --profile, also record tracemalloc peaks per stage (slower)')
+    parser.add_argument('--cprofile', metavar='DIR', help='dump a cProfile of every stage into DIR')
+
+
+def _add_render_args(parser):
+    parser.add_argument('--force', action='store_true',
+                        help='re-render figures even if their inputs are unchanged')
+    parser.add_argument('--output', choices=OUTPUT_PROFILES, default='final',
+                        help='final: 300-dpi png; preview: quick 72-dpi <name>.preview.png; svg/pdf: vector files')
+
+
+def parse_args(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # the old `billboard.py [data.csv] [options]` form still means "everything"
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ('-h', '--help')):
+        argv.insert(0, 'all')
+
+    parser = argparse.ArgumentParser(description='Billboard #1 hits across consumption eras')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    everything = commands.add_parser('all', help='compute the statistics and render every figure')
+    _add_common_args(everything)
+    _add_render_args(everything)
+
+    stats = commands.add_parser('stats', help='compute and print the numbers only (no plotting imports)')
+    _add_common_args(stats)
+    stats.add_argument('--json', metavar='PATH', help='also write every table to a JSON file')
+
+    render = commands.add_parser('render', help='render selected figures')
+    render.add_argument('figures', type=_figure_list, metavar='FIGURE',
+                        help=f"comma-separated figure names or 'all' ({', '.join(FIGURE_NAMES)})")
+    _add_common_args(render)
+    _add_render_args(render)
+
+    cube = commands.add_parser('cube', help='build the Year x Genre x structure x gender cube and save it')
+    cube.add_argument('path', nargs='?', default=os.environ.get('BILLBOARD_DATA', DEFAULT_PATH), help='chart CSV')
+    cube.add_argument('--out', default='billboard_cube.npz', help='where to save the cube')
+    cube.add_argument('--chunksize', type=int, default=None, help='read the CSV in chunks of N rows')
+    cube.add_argument('--profile', metavar='PATH', help='write a per-stage timing/memory report')
+
+    append = commands.add_parser('append', help='add new chart rows to a saved cube in place and refresh the figures')
+    append.add_argument('state', help='the .npz cube to update (made by the cube command)')
+    append.add_argument('path', help='the grown chart CSV the cube was built from, or a CSV of just the new rows')
+    _add_output_args(append)
+    append.add_argument('--jobs', '-j', type=int, default=1, help='worker processes for rendering')
+    _add_render_args(append)
+    append.add_argument('--no-render', action='store_true', help='only update the cube')
+
+    serve = commands.add_parser('serve', help='answer table and cube queries over local HTTP/JSON')
+    serve.add_argument('path', nargs='?', default=os.environ.get('BILLBOARD_DATA', DEFAULT_PATH),
+                       help='chart CSV or a saved .npz cube; reloaded when it changes')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000)
+    serve.add_argument('--cache-size', type=int, default=256, help='query results kept in the LRU cache')
+
+    batch = commands.add_parser('batch', help='run the analysis for every dataset in a JSON manifest')
+    batch.add_argument('manifest', help='JSON list of datasets (path, out_dir, eras, era_names, command, options)')
+    batch.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1,
+                       help='datasets analysed at once (default: one per CPU)')
+
+    compare = commands.add_parser('compare-backends',
+                                  help='run the analysis with each dataframe backend and check the tables match')
+    compare.add_argument('path', nargs='?', default=os.environ.get('BILLBOARD_DATA', DEFAULT_PATH), help='chart CSV')
+    compare.add_argument('--backends', type=_backend_list, default=list(BACKENDS), metavar='NAME,NAME',
+                         help=f"backends to compare, the first being the reference (default {','.join(BACKENDS)})")
+    compare.add_argument('--eras', type=_era_years, default=list(ERA_BOUNDARIES), metavar='YEAR,YEAR')
+    compare.add_argument('--era-names', type=_era_names, default=list(ERA_NAMES), metavar='NAME,NAME,NAME')
+    compare.add_argument('--trend', type=_trend_specs, default=['104w', 'ewm52w'], metavar='WINDOWS',
+                         help='weekly trends to compare as well (default 104,ewm52)')
+
+    args = parser.parse_args(argv)
+    if args.command in ('cube', 'append', 'serve', 'batch'):
+        return args
+    if args.command == 'compare-backends':
+        missing = [name for name in args.backends if name != 'pandas' and importlib.util.find_spec(name) is None]
+        if missing:
+            parser.error(f"--backends {','.join(missing)} needs {' and '.join(missing)} installed")
+        return args
+    if args.command == 'all':
+        args.figures = FIGURE_NAMES
+    if args.bootstrap and args.chunksize:
+        parser.error('--bootstrap needs the row-level data and cannot be combined with --chunksize')
+    if args.bootstrap and is_cube(args.path):
+        parser.error('--bootstrap needs the row-level data and cannot be run on a cube')
+    if args.trend and is_cube(args.path):
+        parser.error('--trend needs the hit dates and cannot be run on a cube')
+    if args.backend != 'pandas':
+        if args.chunksize or is_cube(args.path) or args.compact:
+            parser.error(f'--backend {args.backend} is for whole-file loads; drop --chunksize/--compact or the cube')
+        if importlib.util.find_spec(args.backend) is None:
+            parser.error(f'--backend {args.backend} needs {args.backend} installed (pip install {args.backend})')
+    return args
+
+
+def run_analysis(args, inst, df=None):
+    """Load (or stream) the data and compute everything the commands report or draw.
+
+    df: the rows of args.path when they are already loaded (see run_batch_group).
+    Returns (figure inputs, rows, first date, last date, per-year moments or None).
+    """
+    if is_cube(args.path):
+        with inst.span('load_cube') as span:
+            cube = Cube.load(args.path, args.eras, args.era_names)
+            span['rows'] = cube.cells
+        aggs, inputs = analyze_cube(cube, inst=inst)
+        year_moments = cube.moments('Year', metrics.values()) if args.sweep_boundaries else None
+        return inputs, cube.rows, cube.first_date, cube.last_date, year_moments
+
+    if args.chunksize:
+        # derived features are row-wise, so they can be added chunk by chunk
+        chunks = (derive_features(chunk, args.eras, args.era_names) for chunk in iter_chunks(args.path, args.chunksize))
+        acc, aggs, inputs = analyze_stream(chunks, sweep=args.sweep_boundaries, inst=inst, trend=args.trend,
+                                           boundaries=args.eras, names=args.era_names)
+        return inputs, acc.rows, acc.first_date, acc.last_date, acc.moments['Year']
+
+    backend = get_backend(args.backend)
+    if df is None:
+        with inst.span('ingest') as span:
+            # a lazy scan for polars: the CSV is only read when the features are collected
+            df = backend.load(args.path, compact=args.compact)
+            span['rows'] = backend.count(df)
+    with inst.span('features') as span:
+        # derived features: year, length in minutes, era and binary indicators
+        df = backend.features(df, args.eras, args.era_names)
+        span['rows'] = backend.count(df)
+    if args.compact:
+        with inst.span('compact', rows=len(df)) as span:
+            # the source columns were read compact; this narrows the derived ones and measures
+            # every column against the default schema
+            report = compact_dtypes(df)
+            span['mb_before'], span['mb_after'] = report.loc['total', ['MB before', 'MB']]
+        peak = peak_rss_mb()
+        if peak is not None:
+            report.loc['peak RSS after loading'] = ['', np.nan, '', peak]
+        os.makedirs(args.out_dir, exist_ok=True)
+        report.to_csv(os.path.join(args.out_dir, 'memory_report.csv'))
+        before, after = report.loc['total', ['MB before', 'MB']]
+        rss = '' if peak is None else f', peak RSS {peak:.0f} MB'
+        print(f"compact schema: {before:.1f} MB -> {after:.1f} MB ({1 - after / before:.0%} less{rss}, "
+              f"saved memory_report.csv)")
+    aggs, inputs = analyze(df, args.bootstrap, args.seed, args.jobs, inst=inst, trend=args.trend,
+                           boundaries=args.eras, names=args.era_names, backend=backend)
+    rows, first, last = backend.summary(df)
+    year_moments = None
+    if args.sweep_boundaries:
+        with inst.span('year_moments', rows=rows):
+            year_moments = Moments('Year', metrics.values()).update(backend.rows(df, ['Year', *metrics.values()]))
+    return inputs, rows, first, last, year_moments
+
+
+def render_figures(inputs, names, args, inst):
+    from figures import render_all
+
+    with inst.span('render'):
+        # render_all yields in figure order, so each span covers one figure (or waiting on it)
+        rendered_figures = render_all({name: inputs[name] for name in names}, args.out_dir, args.output,
+                                      jobs=args.jobs, force=args.force)
+        for name in [name for name in FIGURE_NAMES if name in names]:
+            with inst.span(f'render:{name}'):
+                path, rendered = next(rendered_figures)
+            print(f"{'saved' if rendered else 'unchanged'} {os.path.basename(path)}")
+
+
+def save_cube(args):
+    inst = Instrumentation()
+    cube = build_cube(args.path, args.chunksize, inst=inst)
+    cube.save(args.out)
+    print(f"{cube.rows} songs in {cube.cells} cells, saved {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB)")
+    if args.profile:
+        inst.write(args.profile)
+        print(f"\n{inst.summary()}\nsaved {args.profile}")
+
+
+def append_state(args):
+    inst = Instrumentation()
+    with inst.span('load_cube'):
+        cube = Cube.load(args.state, args.eras, args.era_names)
+    before = cube.rows
+    try:
+        new = append_rows(cube, args.path, args.eras, args.era_names, inst=inst)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if not len(new):
+        print(f"no rows after {cube.last_date.date()} in {args.path}; {args.state} is up to date")
+        return
+    with inst.span('save_cube'):
+        cube.save(args.state)
+    years = ', '.join(str(year) for year in sorted(new['Year'].unique()))
+    eras = ', '.join(new['Era'].unique().dropna())
+    seconds = sum(span['wall_s'] for span in inst.spans if span['parent'] is None)
+    print(f"added {len(new)} rows ({new['Date'].min().date()} to {new['Date'].max().date()}) in {seconds:.2f}s: "
+          f"{before} -> {cube.rows} songs, saved {args.state}")
+    print(f"changed years: {years}; eras: {eras}\n")
+    if args.no_render:
+        return
+
+    # everything else is answered from the cube's cells; figures whose tables didn't change are skipped
+    refresh = parse_args(['all', args.state])
+    for name in ('out_dir', 'eras', 'era_names', 'jobs', 'force', 'output'):
+        setattr(refresh, name, getattr(args, name))
+    return run(refresh)
+
+
+def check_backends(args):
+    """The compare-backends command: exit status 1 if any backend's tables differ from the first's."""
+    results = compare_backends(args.path, args.backends, args.trend, args.eras, args.era_names)
+    reference = results[0][0]
+    for name, seconds, diffs in results:
+        if name == reference:
+            print(f"{name}: {seconds:.2f}s (reference)")
+        elif not diffs:
+            print(f"{name}: {seconds:.2f}s, every table matches {reference}")
+        else:
+            print(f"{name}: {seconds:.2f}s, {len(diffs)} tables differ from {reference}:")
+            for where, how in diffs:
+                print(f"  {where}: {how[:300]}")
+    return 1 if any(diffs for name, seconds, diffs in results) else 0
+
+
+def shares_rows(args):
+    """Whether the command reads args.path whole, so batch runs on the same file can share one load."""
+    return not args.chunksize and not is_cube(args.path)
+
+
+def batch_groups(datasets):
+    """[(name, args)] grouped so that datasets loading the same file whole do it once."""
+    groups = {}
+    for name, args in datasets:
+        key = (os.path.abspath(args.path), args.compact, args.backend) if shares_rows(args) else name
+        groups.setdefault(key, []).append((name, args))
+    return list(groups.values())
+
+
+def run_batch_group(group):
+    """Batch worker: run one group of (name, args), ingesting their shared file once.
+
+    Each dataset's output goes to billboard.log in its out dir, and a failure is recorded
+    (with its traceback in the log) without stopping the rest. Returns [(name, error or None, seconds)].
+    """
+    results = []
+    df = None
+    for name, args in group:
+        start = time.perf_counter()
+        error = None
+        os.makedirs(args.out_dir, exist_ok=True)
+        with open(os.path.join(args.out_dir, 'billboard.log'), 'w') as log, redirect_stdout(log):
+            try:
+                if df is None and len(group) > 1:
+                    df = get_backend(args.backend).load(args.path, compact=args.compact)
+                run(args, df)
+            except Exception as e:
+                traceback.print_exc(file=log)
+                error = f'{type(e).__name__}: {e}'
+        results.append((name, error, time.perf_counter() - start))
+    return results
+
+
+def run_batch(args):
+    from batch import read_manifest, run_batch
+
+    manifest = read_manifest(args.manifest)
+    datasets, failed = [], {}
+    for name, argv in manifest:
+        try:
+            datasets.append((name, parse_args(argv)))
+        except SystemExit:
+            # argparse has printed why
+            failed[name] = f"bad options: {' '.join(argv)}"
+            print(f"{name}: FAILED: {failed[name]}")
+    outcomes = run_batch(batch_groups(datasets), run_batch_group, args.workers)
+    failed.update({name: error for name, error in outcomes.items() if error is not None})
+    print(f"\n{len(manifest) - len(failed)} of {len(manifest)} datasets succeeded")
+    for name, error in failed.items():
+        print(f"  {name}: {error}")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'cube':
+        return save_cube(args)
+    if args.command == 'append':
+        return append_state(args)
+    if args.command == 'serve':
+        from service import QueryService, serve
+
+        return serve(QueryService(args.path, load_snapshot, cache_size=args.cache_size), args.host, args.port)
+    if args.command == 'batch':
+        return run_batch(args)
+    if args.command == 'compare-backends':
+        return check_backends(args)
+    return run(args)
+
+
+def run(args, df=None):
+    """The all/stats/render commands for parsed args; df: the rows of args.path if already loaded."""
+    inst = Instrumentation(trace_memory=args.trace_memory, cprofile_dir=args.cprofile)
+
+    inputs, rows, first, last, year_moments = run_analysis(args, inst, df)
+
+    if args.command != 'stats':
+        print("Creating visualizations for 4 research questions...")
+    print(f"Dataset: {rows} songs from {first.date()} to {last.date()}\n")
+
+    if 'trends' in inputs:
+        os.makedirs(args.out_dir, exist_ok=True)
+        inputs['trends'].to_csv(os.path.join(args.out_dir, 'trends.csv'))
+        windows = ', '.join(inputs['trends'].columns.get_level_values('window').unique())
+        print(f"weekly trends ({windows}) saved to trends.csv\n")
+
+    ci = inputs['era_changes']['ci']
+    if ci is not None:
+        os.makedirs(args.out_dir, exist_ok=True)
+        ci.to_csv(os.path.join(args.out_dir, 'era_changes_ci.csv'))
+        print(f"era changes, {args.bootstrap} resamples (saved era_changes_ci.csv):")
+        print(ci.round(4).to_string(), "\n")
+
+    sweep = None
+    if args.sweep_boundaries:
+        with inst.span('boundary_sweep'):
+            sweep = boundary_sweep(year_moments, current=args.eras)
+        os.makedirs(args.out_dir, exist_ok=True)
+        sweep.to_csv(os.path.join(args.out_dir, 'era_boundaries.csv'))
+        print("best era boundaries by ANOVA F (saved era_boundaries.csv):")
+        print(sweep.round(3).to_string(), "\n")
+
+    if args.command == 'stats':
+        tables = stats_tables(inputs)
+        for name, table in tables.items():
+            print(f"{name}:\n{table.round(4).to_string()}\n")
+        if args.json:
+            extra = {'era_changes_ci': ci, 'era_boundaries': sweep}
+            tables.update({name: table for name, table in extra.items() if table is not None})
+            with open(args.json, 'w') as f:
+                json.dump(_to_json(tables), f, indent=2)
+            print(f"saved {args.json}")
+    else:
+        render_figures(inputs, args.figures, args, inst)
+
+    if args.profile:
+        inst.write(args.profile)
+        print(f"\n{inst.summary()}\nsaved {args.profile}")
+
+    print("success")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Search for the era boundary years that best separate each metric.
+
+Per-year counts, sums and sums of squares are turned into prefix sums once, after which
+any segment's n / sum / sum of squares is two subtractions, so every candidate single or
+double split is scored in O(1) (and all of them at once with array ops).
+"""
+import numpy as np
+import pandas as pd
+
+
+class BoundarySearch:
+    """Candidate era boundaries scored from per-year moments (a streaming.Moments keyed by Year).
+
+    A boundary year b starts a new era, so a single split is [.., b-1] | [b, ..] and a double
+    split (b1, b2) gives three eras, like the default (2007, 2020).
+    """
+
+    def __init__(self, moments, min_years=3):
+        years = np.arange(int(moments.count.index.min()), int(moments.count.index.max()) + 1)
+        self.years = years
+        self.min_years = min_years
+        # prefix sums with a leading zero row: segment [i, j) = P[j] - P[i]
+        self._n = self._prefix(moments.count.reindex(years).fillna(0))
+        self._s = self._prefix(moments.sum.reindex(years).fillna(0))
+        self._q = self._prefix(moments.sumsq.reindex(years).fillna(0))
+        # 0/1 columns (sum of squares == sum) also get a chi-square score
+        self._binary = {col: bool(np.allclose(moments.sumsq[col], moments.sum[col])) for col in moments.columns}
+
+    @staticmethod
+    def _prefix(table):
+        values = table.to_numpy(dtype='float64')
+        return pd.DataFrame(np.vstack([np.zeros(values.shape[1]), np.cumsum(values, axis=0)]),
+                            columns=table.columns)
+
+    def _segments(self, col, cuts):
+        # cuts: (candidates, k+1) indices into the prefix arrays, first column 0, last len(years)
+        n, s, q = (p[col].to_numpy()[cuts] for p in (self._n, self._s, self._q))
+        return np.diff(n, axis=1), np.diff(s, axis=1), np.diff(q, axis=1)
+
+    def _score(self, col, cuts):
+        n, s, q = self._segments(col, cuts)
+        N, S, Q = n.sum(axis=1), s.sum(axis=1), q.sum(axis=1)
+        k = n.shape[1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = s / n
+            grand = S / N
+            # one-way ANOVA F: between-era vs within-era variance
+            ss_between = (n * (means - grand[:, None]) ** 2).sum(axis=1)
+            ss_within = Q - (s ** 2 / n).sum(axis=1)
+            f_stat = (ss_between / (k - 1)) / (ss_within / (N - k))
+            # largest jump between consecutive eras
+            max_diff = np.abs(np.diff(means, axis=1)).max(axis=1)
+            if self._binary[col]:
+                # chi-square of the era x (0/1) table, which only needs n and the count of ones
+                p = grand[:, None]
+                chi2 = ((s - n * p) ** 2 / (n * p * (1 - p))).sum(axis=1)
+            else:
+                chi2 = np.full(len(cuts), np.nan)
+        return pd.DataFrame({'max_diff': max_diff, 'f_stat': f_stat, 'chi2': chi2})
+
+    def _cut_index(self, year):
+        return int(np.searchsorted(self.years, year))
+
+    def single(self, col):
+        """Every single boundary, scored; one row per candidate year."""
+        m, end = self.min_years, len(self.years)
+        idx = np.arange(m, end - m + 1)
+        cuts = np.column_stack([np.zeros_like(idx), idx, np.full_like(idx, end)])
+        scores = self._score(col, cuts)
+        scores.insert(0, 'boundary', self.years[idx])
+        return scores
+
+    def double(self, col):
+        """Every boundary pair (b1 < b2), scored; one row per candidate pair."""
+        m, end = self.min_years, len(self.years)
+        i, j = np.triu_indices(end + 1, k=m)
+        keep = (i >= m) & (j <= end - m)
+        i, j = i[keep], j[keep]
+        cuts = np.column_stack([np.zeros_like(i), i, j, np.full_like(i, end)])
+        scores = self._score(col, cuts)
+        scores.insert(0, 'boundary_2', self.years[j])
+        scores.insert(0, 'boundary_1', self.years[i])
+        return scores
+
+    def score(self, col, boundaries):
+        """Scores of one specific set of boundary years (e.g. the current eras)."""
+        cuts = np.array([[0, *(self._cut_index(b) for b in boundaries), len(self.years)]])
+        return self._score(col, cuts).iloc[0]
+
+
+def _best(scores, by):
+    # the best-scoring candidate row, or None when there is no scored candidate (too few years)
+    valid = scores[by].dropna()
+    return None if valid.empty else scores.loc[valid.idxmax()]
+
+
+def best_boundaries(moments, labels, current=(2007, 2020), min_years=3, by='f_stat'):
+    """Best single and double boundary per metric, next to how the current boundaries score.
+
+    labels: {display label: column}. Returns one row per metric. With fewer than 2 x min_years
+    years of data there is no single-boundary candidate, and with fewer than 3 x min_years no
+    pair; the missing bests (and a rank that can't be taken) are NaN.
+    """
+    search = BoundarySearch(moments, min_years=min_years)
+    rows = []
+    for label, col in labels.items():
+        double = search.double(col)
+        best_1 = _best(search.single(col), by)
+        best_2 = _best(double, by)
+        now = search.score(col, current)
+        ranked = best_2 is not None and not np.isnan(now[by])
+        rows.append({
+            'metric': label,
+            'best_single': np.nan if best_1 is None else int(best_1['boundary']),
+            f'best_single_{by}': np.nan if best_1 is None else best_1[by],
+            'best_double': None if best_2 is None else f"{int(best_2['boundary_1'])}/{int(best_2['boundary_2'])}",
+            f'best_double_{by}': np.nan if best_2 is None else best_2[by],
+            f'current_{by}': now[by],
+            'current_rank': int((double[by] > now[by]).sum()) + 1 if ranked else np.nan,
+            'best_double_chi2': np.nan if best_2 is None else best_2['chi2'],
+        })
+    return pd.DataFrame(rows).set_index('metric')
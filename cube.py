@@ -0,0 +1,319 @@
+"""A materialized count/sum cube over Year x Genre x Artist Structure x artist/songwriter/producer gender.
+
+Rows are reduced once to one cell per distinct combination of the dimension values, each
+holding the row count and the non-null count, sum and sum of squares of the value columns.
+Any grouped table the script draws (by Era, Decade, Year, Genre, or combinations) is then a
+sum over cells, so it never touches the rows again. Eras and decades are derived from the
+Year labels at query time, so the era boundaries can change without rebuilding the cube.
+
+Cubes are mergeable like the streaming accumulators and are saved as a compressed .npz of
+plain arrays. A saved cube is the persisted state that `billboard.py append` updates: it also
+records how much of its source CSV it has read (Cube.source), so later rows can be added
+without reading the rest again.
+"""
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from aggregate import AggregationResult
+from features import ERA_BOUNDARIES, ERA_NAMES, FLAG_SPECS, assign_era
+from streaming import Histogram, Moments
+
+DIMS = ['Year', 'Discogs Genre', 'Artist Structure', 'Artist Male', 'Songwriter Male', 'Producer Male']
+
+# columns kept as count / sum / sum of squares per cell
+VALUE_COLS = ['Length (min)', 'Weeks at Number One', 'Front Person Age', 'Multiple Lead Vocalists',
+              'Artist is a Songwriter', 'Artist is Only Songwriter', 'Artist is a Producer', 'Artist is Only Producer']
+
+# flags that are a dimension value are read off the dimension; the rest are summed per cell
+DIM_FLAGS = {name: spec for name, spec in FLAG_SPECS.items() if spec[0] in DIMS}
+SUMMED_FLAGS = [name for name in FLAG_SPECS if name not in DIM_FLAGS]
+
+CUBE_VERSION = 1
+
+
+class Cube:
+    """Cells of the DIMS cube, built with update(featured chunk) / merge(other) and queried by key.
+
+    Query keys are any of DIMS plus 'Era' and 'Decade'. Columns are VALUE_COLS or any flag
+    in FLAG_SPECS; a flag's mean is over all rows (missing source values count as 0), a value
+    column's mean over its non-null values, as in the row-level tables.
+    """
+
+    def __init__(self, boundaries=ERA_BOUNDARIES, names=ERA_NAMES):
+        self.boundaries = list(boundaries)
+        self.names = list(names)
+        self.labels = [np.array([]) for _ in DIMS]
+        self.codes = np.empty((0, len(DIMS)), dtype=np.int32)
+        self.measures = {}
+        # whole-second song lengths per year (bins widen as needed), for the box plots and the length chi-square
+        self.length = Histogram('Year', 'Length (Sec)')
+        self.rows = 0
+        self.first_date = self.last_date = None
+        # {'path', 'offset', 'tail'}: the source CSV, bytes read so far and ingest.tail_hash at offset
+        self.source = None
+
+    @property
+    def cells(self):
+        return len(self.codes)
+
+    def update(self, chunk):
+        codes, labels = [], []
+        for dim in DIMS:
+            dim_codes, uniques = pd.factorize(chunk[dim], sort=True)
+            codes.append(dim_codes)
+            labels.append(np.asarray(uniques))
+
+        values = {'rows': np.ones(len(chunk))}
+        for col in VALUE_COLS:
+            v = chunk[col].to_numpy(dtype='float64')
+            present = ~np.isnan(v)
+            v = np.where(present, v, 0)
+            values['count', col] = present.astype('float64')
+            values['sum', col] = v
+            values['sumsq', col] = v ** 2
+        for flag in SUMMED_FLAGS:
+            values['sum', flag] = chunk[flag].to_numpy(dtype='float64')
+
+        part = Cube(self.boundaries, self.names)
+        part.labels = labels
+        part.codes, part.measures = _reduce(labels, np.column_stack(codes), values)
+        part.length.update(chunk)
+        part.rows = len(chunk)
+        if len(chunk):
+            part.first_date, part.last_date = chunk['Date'].min(), chunk['Date'].max()
+        return self.merge(part)
+
+    def merge(self, other):
+        if not self.measures:
+            self.labels, self.codes, self.measures = other.labels, other.codes, other.measures
+        elif other.measures:
+            labels = [np.union1d(mine, theirs) for mine, theirs in zip(self.labels, other.labels)]
+            codes = np.column_stack([
+                np.concatenate([_recode(self.codes[:, i], self.labels[i], labels[i]),
+                                _recode(other.codes[:, i], other.labels[i], labels[i])])
+                for i in range(len(DIMS))])
+            measures = {name: np.concatenate([self.measures[name], other.measures[name]]) for name in self.measures}
+            self.labels = labels
+            self.codes, self.measures = _reduce(labels, codes, measures)
+        self.length.merge(other.length)
+        self.rows += other.rows
+        self.first_date = _extreme(min, self.first_date, other.first_date)
+        self.last_date = _extreme(max, self.last_date, other.last_date)
+        return self
+
+    # -- queries ---------------------------------------------------------------
+
+    def _key_codes(self, key):
+        """(code per cell, labels) for a dimension or a key derived from Year; -1 = missing."""
+        if key in DIMS:
+            i = DIMS.index(key)
+            return self.codes[:, i], self.labels[i]
+        year_codes, years = self._key_codes('Year')
+        per_year, labels = self._by_year(key, years)
+        per_year = np.append(per_year, -1)  # code -1 (missing year) stays missing
+        return per_year[year_codes], labels
+
+    def _by_year(self, key, years):
+        # (code per year, labels) of a key derived from Year
+        if key == 'Era':
+            return np.asarray(assign_era(years, self.boundaries, self.names).codes), np.array(self.names, dtype=object)
+        if key == 'Decade':
+            labels, codes = np.unique(np.asarray(years) // 10 * 10, return_inverse=True)
+            return codes, labels
+        raise KeyError(f'{key!r} is not a cube dimension')
+
+    def _cell_values(self, column):
+        """(sum, non-null count, sum of squares) of column per cell."""
+        rows = self.measures['rows']
+        if column in DIM_FLAGS:
+            source, code = DIM_FLAGS[column]
+            i = DIMS.index(source)
+            hits = np.flatnonzero(self.labels[i] == code)
+            on = rows * np.isin(self.codes[:, i], hits)
+            return on, rows, on
+        if column in SUMMED_FLAGS:
+            on = self.measures['sum', column]
+            return on, rows, on
+        if column in VALUE_COLS:
+            return self.measures['sum', column], self.measures['count', column], self.measures['sumsq', column]
+        raise KeyError(f'{column!r} is not in the cube')
+
+    def _group_sums(self, keys, values):
+        """Sum each of {name: per-cell array} over the groups of keys, skipping missing keys."""
+        codes, labels = zip(*(self._key_codes(key) for key in keys))
+        codes = np.column_stack(codes)
+        present = (codes >= 0).all(axis=1)
+        flat = np.ravel_multi_index(codes[present].T, [len(l) for l in labels])
+        groups, inverse = np.unique(flat, return_inverse=True)
+        sums = {name: np.bincount(inverse, weights=v[present], minlength=len(groups)) for name, v in values.items()}
+
+        group_codes = np.unravel_index(groups, [len(l) for l in labels])
+        if len(keys) == 1:
+            index = pd.Index(labels[0][group_codes[0]], name=keys[0])
+        else:
+            index = pd.MultiIndex.from_arrays([l[c] for l, c in zip(labels, group_codes)], names=keys)
+        return pd.DataFrame(sums, index=index)
+
+    def sizes(self, keys):
+        """Row counts per group of one key or a list of keys."""
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        return self._group_sums(keys, {'rows': self.measures['rows']})['rows'].astype(np.int64)
+
+    def moments(self, key, columns):
+        """A streaming.Moments of columns by key (or a list of keys), so Moments consumers take cubes too."""
+        keys = [key] if isinstance(key, str) else list(key)
+        values = {}
+        for col in columns:
+            values['sum', col], values['count', col], values['sumsq', col] = self._cell_values(col)
+        values['rows'] = self.measures['rows']
+        sums = self._group_sums(keys, values)
+        out = Moments(key, columns)
+        out.size = sums.pop('rows').astype(np.int64)
+        for stat in ('count', 'sum', 'sumsq'):
+            setattr(out, stat, pd.DataFrame({col: sums[stat, col] for col in columns}, index=sums.index))
+        return out
+
+    def table(self, key, columns, stat='mean'):
+        """Group-by-key table of stat (mean, sum or count) for columns, like AggregationResult.table."""
+        m = self.moments(key, columns)
+        if stat == 'mean':
+            # kept in key order (eras chronologically), unlike Moments.mean()
+            return m.sum / m.count.where(m.count > 0)
+        if stat in ('sum', 'count'):
+            return getattr(m, stat)
+        raise ValueError(f'{stat!r} cannot be computed from the cube')
+
+    def crosstab(self, row, col):
+        """Row counts of row x col, as pd.crosstab(df[row], df[col]) (col a key or a 0/1 column)."""
+        if col in DIMS or col in ('Era', 'Decade'):
+            return self.sizes([row, col]).unstack(fill_value=0)
+        # 0/1 columns: the ones are the sum, the zeros the rest of the non-null count
+        m = self.moments(row, [col])
+        table = pd.DataFrame({0: m.count[col] - m.sum[col], 1: m.sum[col]}).round().astype(np.int64)
+        return table.loc[:, table.sum() > 0].rename_axis(columns=col)
+
+    def subset(self, filters):
+        """A Cube of the cells whose keys take the given values, from {key: [values]}.
+
+        Values are converted to the key's label type ('2010' -> 2010, '1' -> 1.0). The length
+        histogram can only follow Year-derived keys; filtering on any other key empties it.
+        Cells carry no dates, so the subset has no first/last date.
+        """
+        keep = np.ones(self.cells, dtype=bool)
+        years = np.array(sorted(self.length.counts))
+        keep_years = np.ones(len(years), dtype=bool)
+        for key, values in filters.items():
+            codes, labels = self._key_codes(key)
+            wanted = np.asarray(values).astype(labels.dtype)
+            keep &= np.isin(codes, np.flatnonzero(np.isin(labels, wanted)))
+            if key == 'Year':
+                keep_years &= np.isin(years, wanted)
+            elif key in DIMS:
+                keep_years[:] = False
+            else:
+                year_codes, _ = self._by_year(key, years)
+                keep_years &= np.isin(year_codes, np.flatnonzero(np.isin(labels, wanted)))
+
+        out = Cube(self.boundaries, self.names)
+        out.labels = self.labels
+        out.codes = self.codes[keep]
+        out.measures = {name: values[keep] for name, values in self.measures.items()}
+        out.length = self.length.regroup({year: year for year in years[keep_years]}, 'Year')
+        out.rows = int(out.measures['rows'].sum()) if out.measures else 0
+        return out
+
+    def length_histogram(self, key='Era'):
+        """The song-length Histogram regrouped from years onto a key derived from Year."""
+        if key == 'Year':
+            return self.length
+        years = np.array(sorted(self.length.counts))
+        codes, labels = self._by_year(key, years)
+        return self.length.regroup({year: labels[c] for year, c in zip(years, codes) if c >= 0}, key)
+
+    def aggregates(self, plan):
+        """An AggregationResult with the plan's grouped tables and sizes (not its per-row splits)."""
+        tables = {(key, stat): self.table(key, cols, stat) for key, stat, cols in plan.requests()}
+        # unnamed, as groupby().size() in AggregationPlan
+        sizes = {key: self.sizes(key).rename(None) for key in plan.size_keys()}
+        return AggregationResult(tables, sizes, {})
+
+    # -- storage ---------------------------------------------------------------
+
+    def save(self, path):
+        arrays = {'version': np.array(CUBE_VERSION), 'rows': np.array(self.rows), 'codes': self.codes,
+                  'dates': np.array([self.first_date, self.last_date], dtype='datetime64[ns]')}
+        for dim, labels in zip(DIMS, self.labels):
+            arrays[f'labels/{dim}'] = labels.astype(str) if labels.dtype == object else labels
+        for name, values in self.measures.items():
+            arrays['measure/' + '/'.join(name if isinstance(name, tuple) else [name])] = values
+        years = sorted(self.length.counts)
+        arrays['length/years'] = np.array(years, dtype='float64')
+        arrays['length/lo'] = np.array(self.length.lo)
+        arrays['length/counts'] = np.array([self.length.counts[y] for y in years], dtype=np.int64).reshape(
+            len(years), len(self.length.values))
+        arrays['length/min'] = np.array([self.length.min[y] for y in years], dtype='float64')
+        arrays['length/max'] = np.array([self.length.max[y] for y in years], dtype='float64')
+        if self.source is not None:
+            arrays.update({f'source/{name}': np.array(value) for name, value in self.source.items()})
+        # write then rename, so a reader (e.g. the query service) never sees half a file
+        tmp = path + '.tmp'
+        _write_npz(tmp, arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, boundaries=ERA_BOUNDARIES, names=ERA_NAMES):
+        cube = cls(boundaries, names)
+        with np.load(path) as data:
+            if int(data['version']) != CUBE_VERSION:
+                raise ValueError(f'{path} is a version {int(data["version"])} cube, expected {CUBE_VERSION}')
+            cube.rows = int(data['rows'])
+            cube.codes = data['codes']
+            first, last = data['dates']
+            cube.first_date, cube.last_date = (None if np.isnat(d) else pd.Timestamp(d) for d in (first, last))
+            cube.labels = [data[f'labels/{dim}'] for dim in DIMS]
+            cube.labels = [l.astype(object) if l.dtype.kind == 'U' else l for l in cube.labels]
+            for name in data.files:
+                if name.startswith('measure/'):
+                    parts = tuple(name.split('/')[1:])
+                    cube.measures[parts[0] if len(parts) == 1 else parts] = data[name]
+            # cubes saved before the bins could widen start at 0
+            start = int(data['length/lo']) if 'length/lo' in data.files else 0
+            for year, counts, lo, hi in zip(data['length/years'], data['length/counts'],
+                                            data['length/min'], data['length/max']):
+                cube.length.add_group(int(year), counts, lo, hi, start=start)
+            if 'source/path' in data.files:
+                cube.source = {'path': str(data['source/path']), 'offset': int(data['source/offset']),
+                               'tail': str(data['source/tail'])}
+        return cube
+
+
+def _write_npz(path, arrays, compresslevel=1):
+    # np.savez_compressed at deflate level 1: about 4x faster for a ~30% bigger file, which
+    # matters when `append` rewrites the cube every week
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as z:
+        for name, values in arrays.items():
+            with z.open(name + '.npy', 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asanyarray(values), allow_pickle=False)
+
+
+def _extreme(pick, *dates):
+    dates = [d for d in dates if d is not None]
+    return pick(dates) if dates else None
+
+
+def _recode(codes, labels, union):
+    # codes into labels -> codes into union (a sorted superset); -1 stays -1
+    mapping = np.append(np.searchsorted(union, labels), -1).astype(np.int32)
+    return mapping[codes]
+
+
+def _reduce(labels, codes, values):
+    """Sum values over rows/cells with identical codes; returns (distinct codes, summed values)."""
+    shape = [len(l) + 1 for l in labels]
+    flat = np.ravel_multi_index((np.asarray(codes, dtype=np.int64) + 1).T, shape)
+    cells, inverse = np.unique(flat, return_inverse=True)
+    codes = (np.column_stack(np.unravel_index(cells, shape)) - 1).astype(np.int32)
+    return codes, {name: np.bincount(inverse, weights=v, minlength=len(cells)) for name, v in values.items()}
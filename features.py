@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# "consumption eras": each boundary is the first year of the next era
+ERA_NAMES = ['Pre-Digital', 'Streaming', 'Post-Short-Form']
+ERA_BOUNDARIES = [2007, 2020]
+
+# binary indicators: name -> (source column, code that switches the flag on)
+FLAG_SPECS = {
+    'Solo_Artist': ('Artist Structure', 1),
+    'Duo': ('Artist Structure', 2),
+    'Group': ('Artist Structure', 0),
+
+    'All_Male_Artist': ('Artist Male', 1),
+    'All_Female_Artist': ('Artist Male', 0),
+    'Mixed_Gender_Artist': ('Artist Male', 2),
+
+    'All_Male_Songwriter': ('Songwriter Male', 1),
+    'All_Female_Songwriter': ('Songwriter Male', 0),
+    'Mixed_Gender_Songwriter': ('Songwriter Male', 2),
+
+    'All_Male_Producer': ('Producer Male', 1),
+    'All_Female_Producer': ('Producer Male', 0),
+    'Mixed_Gender_Producer': ('Producer Male', 2),
+
+    'All_White_Artist': ('Artist White', 1),
+    'All_Black_Artist': ('Artist Black', 1),
+    'All_White_Songwriter': ('Songwriter White', 1),
+    'All_White_Producer': ('Producer White', 1),
+}
+
+
+def assign_era(years, boundaries=ERA_BOUNDARIES, names=ERA_NAMES):
+    """Map an array of years onto era names as an ordered categorical."""
+    if len(names) != len(boundaries) + 1:
+        raise ValueError(f'{len(boundaries)} era boundaries need {len(boundaries) + 1} names, got {len(names)}')
+    years = np.asarray(years, dtype='float64')
+    codes = np.searchsorted(np.asarray(boundaries, dtype='float64'), years, side='right')
+    codes[np.isnan(years)] = -1
+    return pd.Categorical.from_codes(codes, categories=names, ordered=True)
+
+
+def derive_features(df, boundaries=ERA_BOUNDARIES, names=ERA_NAMES, flags=FLAG_SPECS):
+    """Return df with Year, Decade, Length (min), Era and every flag in `flags` added in one go.
+
+    Flags are int8 so means/sums work as before without a full int64 column each.
+    """
+    year = df['Date'].dt.year
+    new = {
+        'Year': year,
+        'Decade': year // 10 * 10,
+        # in float64 whatever the source dtype (the compact schema narrows it)
+        'Length (min)': df['Length (Sec)'].astype('float64') / 60,
+        'Era': assign_era(year, boundaries, names),
+    }
+
+    sources = {}
+    for name, (col, code) in flags.items():
+        if col not in sources:
+            sources[col] = df[col].to_numpy()
+        new[name] = (sources[col] == code).astype(np.int8)
+
+    return pd.concat([df, pd.DataFrame(new, index=df.index)], axis=1)
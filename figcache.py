@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_NAME = '.figures.json'
+
+
+def _feed(h, obj):
+    """Feed a canonical byte form of obj into hash h (tables, arrays, dicts, lists, scalars)."""
+    if isinstance(obj, pd.DataFrame):
+        h.update(b'frame')
+        _feed(h, [str(c) for c in obj.columns])
+        _feed(h, [str(t) for t in obj.dtypes])
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(b'series')
+        _feed(h, [str(obj.name), str(obj.dtype)])
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(b'array' + str(obj.dtype).encode() + str(obj.shape).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b'dict%d' % len(obj))
+        for key in sorted(obj, key=str):
+            _feed(h, str(key))
+            _feed(h, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        h.update(b'list%d' % len(obj))
+        for item in obj:
+            _feed(h, item)
+    else:
+        h.update(repr(obj).encode())
+
+
+def fingerprint(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        _feed(h, part)
+    return h.hexdigest()
+
+
+def code_version(*modules):
+    """Hash of the given modules' source files, so editing plotting code invalidates figures."""
+    h = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class Manifest:
+    """{output file: fingerprint} for a figure directory, stored next to the figures."""
+
+    def __init__(self, out_dir):
+        self.path = os.path.join(out_dir, MANIFEST_NAME)
+        self.out_dir = out_dir
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def is_current(self, filename, fp):
+        return self.entries.get(filename) == fp and os.path.exists(os.path.join(self.out_dir, filename))
+
+    def record(self, filename, fp):
+        self.entries[filename] = fp
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
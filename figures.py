@@ -0,0 +1,429 @@
+import os
+import sys
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+
+from figcache import Manifest, code_version, fingerprint
+
+# eras are drawn in the order of the tables' Era index, coloured by position; the tables and
+# era labels (name and year span) come with each figure's data, so any era config can be drawn
+ERA_COLORS = ['#FF6B6B', '#4ECDC4', '#95E1D3']
+# abbreviations for the small demographics panels
+ERA_SHORT_NAMES = {'Post-Short-Form': 'Post-SF'}
+
+DPI = 300
+
+# output profiles: file format, dpi, whether to crop to the drawn area, a file-name suffix (so
+# previews never overwrite final renders), metadata and rc settings for the save (vector files
+# drop their timestamp, and svg gets a fixed salt for its clip-path ids, so unchanged inputs
+# give byte-identical files)
+PROFILES = {
+    'final': {'format': 'png', 'dpi': DPI, 'tight': True, 'suffix': '', 'metadata': None},
+    'preview': {'format': 'png', 'dpi': 72, 'tight': False, 'suffix': '.preview', 'metadata': None},
+    'svg': {'format': 'svg', 'dpi': DPI, 'tight': True, 'suffix': '', 'metadata': {'Date': None},
+            'rc': {'svg.hashsalt': 'billboard'}},
+    'pdf': {'format': 'pdf', 'dpi': DPI, 'tight': True, 'suffix': '', 'metadata': {'CreationDate': None}},
+}
+
+
+def setup_style():
+    plt.style.use('seaborn-v0_8-darkgrid')
+    sns.set_palette("husl")
+
+
+def _save(path, profile):
+    with plt.rc_context(profile.get('rc', {})):
+        plt.savefig(path, dpi=profile['dpi'], bbox_inches='tight' if profile['tight'] else None,
+                    metadata=profile['metadata'])
+    plt.close()
+
+
+def add_p_value(ax, p_val):
+    ax.text(0.02, 0.98, f'χ² test: p={p_val:.4f}',
+            transform=ax.transAxes, fontsize=9, verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+
+
+# AXES TEMPLATES
+# panel scaffolding shared by several figures, applied once a panel's data is drawn
+
+def _short_names(eras):
+    return [ERA_SHORT_NAMES.get(era, era) for era in eras]
+
+
+def _era_bar_axes(ax, title, ticklabels, small=False, legend=True):
+    # one tick per era, percentage axis; small: the denser text of the 2x3 demographics grid
+    ax.set_ylabel('Percentage', fontsize=10 if small else 11)
+    if small:
+        ax.set_title(title, fontsize=11, fontweight='bold')
+    else:
+        ax.set_title(title, fontsize=12)
+    ax.set_xticks(np.arange(len(ticklabels)))
+    ax.set_xticklabels(ticklabels, fontsize=9)
+    if legend:
+        ax.legend(fontsize=8 if small else None)
+    ax.grid(True, alpha=0.3, axis='y')
+
+
+def _era_lines(ax, boundaries, label=None):
+    for i, year in enumerate(boundaries):
+        ax.axvline(year, color='red', linestyle='--', linewidth=2, alpha=0.7, label=label if i == 0 else None)
+
+
+def _year_axes(ax, boundaries, ylabel, title, titlesize=12, boundary_label=None, legend=True, grid_axis='both'):
+    # a yearly panel with the era boundaries marked
+    _era_lines(ax, boundaries, label=boundary_label)
+    ax.set_xlabel('Year', fontsize=11)
+    ax.set_ylabel(ylabel, fontsize=11)
+    ax.set_title(title, fontsize=titlesize, fontweight='bold')
+    if legend:
+        ax.legend()
+    ax.grid(True, alpha=0.3, axis=grid_axis)
+
+
+# SONG LENGTH
+
+def render_song_length(data, path, profile=PROFILES['final']):
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    fig.suptitle('Song Length Across Consumption Eras', fontsize=14, fontweight='bold')
+
+    # Box plot (stats precomputed with matplotlib.cbook.boxplot_stats)
+    box_stats = [dict(stats, label=label) for stats, label in zip(data['box_stats'], data['era_labels'])]
+    bp = axes[0].bxp(box_stats, patch_artist=True, showmeans=True, meanline=True)
+    for patch, color in zip(bp['boxes'], ERA_COLORS):
+        patch.set_facecolor(color)
+        patch.set_alpha(0.7)
+    axes[0].set_ylabel('Song Length (minutes)', fontsize=11)
+    axes[0].set_title('Distribution of Song Length by Era', fontsize=12)
+    axes[0].grid(True, alpha=0.3, axis='y')
+    add_p_value(axes[0], data['p_value'])
+
+    # Histogram showing distributions (counts precomputed per era)
+    bins = data['bins']
+    for era, color in zip(data['hist'], ERA_COLORS):
+        axes[1].hist(bins[:-1], bins=bins, weights=data['hist'][era], alpha=0.5, label=era, color=color,
+                     edgecolor='black')
+    axes[1].set_xlabel('Song Length (minutes)', fontsize=11)
+    axes[1].set_ylabel('Frequency', fontsize=11)
+    axes[1].set_title('Song Length Distribution by Era', fontsize=12)
+    axes[1].legend()
+    axes[1].grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    _save(path, profile)
+
+
+# ARTIST STRUCTURE
+
+def render_artist_structure(data, path, profile=PROFILES['final']):
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    fig.suptitle('Artist Structure Across Eras', fontsize=14, fontweight='bold')
+
+    # Stacked bar chart
+    structure_by_era = data['structure_by_era']
+    structure_data = structure_by_era.T
+
+    x = np.arange(len(structure_by_era))
+    width = 0.6
+    axes[0].bar(x, structure_data.loc['Solo_Artist'], width, label='Solo',
+                color='#E74C3C', edgecolor='black', alpha=0.8)
+    axes[0].bar(x, structure_data.loc['Duo'], width, bottom=structure_data.loc['Solo_Artist'],
+                label='Duo', color='#F39C12', edgecolor='black', alpha=0.8)
+    axes[0].bar(x, structure_data.loc['Group'], width,
+                bottom=structure_data.loc['Solo_Artist'] + structure_data.loc['Duo'],
+                label='Group (3+)', color='#27AE60', edgecolor='black', alpha=0.8)
+    _era_bar_axes(axes[0], 'Artist Structure Distribution by Era', data['era_labels'])
+    add_p_value(axes[0], data['p_value'])
+
+    # Grouped bar chart comparison
+    x_pos = np.arange(len(structure_by_era))
+    bar_width = 0.25
+    axes[1].bar(x_pos - bar_width, structure_by_era['Solo_Artist'], bar_width,
+                label='Solo', color='#E74C3C', edgecolor='black', alpha=0.8)
+    axes[1].bar(x_pos, structure_by_era['Duo'], bar_width,
+                label='Duo', color='#F39C12', edgecolor='black', alpha=0.8)
+    axes[1].bar(x_pos + bar_width, structure_by_era['Group'], bar_width,
+                label='Group (3+)', color='#27AE60', edgecolor='black', alpha=0.8)
+    _era_bar_axes(axes[1], 'Artist Structure Comparison', list(structure_by_era.index))
+
+    plt.tight_layout()
+    _save(path, profile)
+
+
+# DEMOGRAPHICS
+
+def _three_way_bars(ax, table, cols, title):
+    x = np.arange(len(table))
+    width = 0.25
+    ax.bar(x - width, table[cols[0]], width, label='All Male',
+           color='#3498DB', edgecolor='black', alpha=0.8)
+    ax.bar(x, table[cols[1]], width, label='All Female',
+           color='#E91E63', edgecolor='black', alpha=0.8)
+    ax.bar(x + width, table[cols[2]], width, label='Mixed',
+           color='#9C27B0', edgecolor='black', alpha=0.8)
+    _era_bar_axes(ax, title, _short_names(table.index), small=True)
+
+
+def render_demographics(data, path, profile=PROFILES['final']):
+    fig, axes = plt.subplots(2, 3, figsize=(16, 10))
+    fig.suptitle('Racial & Gender Demographics Across Eras', fontsize=14, fontweight='bold')
+
+    racial_by_era = data['racial_by_era']
+    x = np.arange(len(racial_by_era))
+    width = 0.25
+
+    # Artist Gender
+    _three_way_bars(axes[0, 0], data['gender_by_era'],
+                    ['All_Male_Artist', 'All_Female_Artist', 'Mixed_Gender_Artist'], 'Artist Gender by Era')
+
+    # Artist Race
+    axes[0, 1].bar(x - width / 2, racial_by_era['All_White_Artist'], width, label='All White',
+                   color='#3498DB', edgecolor='black', alpha=0.8)
+    axes[0, 1].bar(x + width / 2, racial_by_era['All_Black_Artist'], width, label='All Black',
+                   color='#2ECC71', edgecolor='black', alpha=0.8)
+    _era_bar_axes(axes[0, 1], 'Artist Race by Era', _short_names(racial_by_era.index), small=True)
+
+    # Songwriter Gender
+    _three_way_bars(axes[0, 2], data['songwriter_gender_by_era'],
+                    ['All_Male_Songwriter', 'All_Female_Songwriter', 'Mixed_Gender_Songwriter'],
+                    'Songwriter Gender by Era')
+
+    # Producer Gender
+    _three_way_bars(axes[1, 0], data['producer_gender_by_era'],
+                    ['All_Male_Producer', 'All_Female_Producer', 'Mixed_Gender_Producer'],
+                    'Producer Gender by Era')
+
+    # Decade-by-decade female representation comparison
+    decade_data = data['decade_data']
+    axes[1, 1].plot(decade_data.index, decade_data['All_Female_Artist'],
+                    marker='o', linewidth=2.5, markersize=8, label='Artist', color='#E91E63')
+    axes[1, 1].plot(decade_data.index, decade_data['All_Female_Songwriter'],
+                    marker='s', linewidth=2.5, markersize=8, label='Songwriter', color='#9C27B0')
+    axes[1, 1].plot(decade_data.index, decade_data['All_Female_Producer'],
+                    marker='^', linewidth=2.5, markersize=8, label='Producer', color='#673AB7')
+    axes[1, 1].set_xlabel('Decade', fontsize=10)
+    axes[1, 1].set_ylabel('Percentage', fontsize=10)
+    axes[1, 1].set_title('All-Female Representation by Decade', fontsize=11, fontweight='bold')
+    axes[1, 1].legend(fontsize=8)
+    axes[1, 1].grid(True, alpha=0.3)
+
+    # Decade-by-decade black representation
+    decade_black = data['decade_black']
+    axes[1, 2].bar(decade_black.index, decade_black.values, color='#2ECC71', edgecolor='black', alpha=0.8, width=8)
+    axes[1, 2].set_xlabel('Decade', fontsize=10)
+    axes[1, 2].set_ylabel('Percentage', fontsize=10)
+    axes[1, 2].set_title('All-Black Artist Representation by Decade', fontsize=11, fontweight='bold')
+    axes[1, 2].grid(True, alpha=0.3, axis='y')
+
+    plt.tight_layout()
+    _save(path, profile)
+
+
+# CREATIVE CONTROL
+
+def render_creative_control(data, path, profile=PROFILES['final']):
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    fig.suptitle('Artist Creative Control Across Eras', fontsize=14, fontweight='bold')
+
+    # Artist as Songwriter
+    songwriter_data = data['songwriter_data']
+    x = np.arange(len(songwriter_data))
+    width = 0.35
+    axes[0].bar(x - width / 2, songwriter_data['Artist is a Songwriter'], width,
+                label='Co-Writes', color='#9B59B6', edgecolor='black', alpha=0.8)
+    axes[0].bar(x + width / 2, songwriter_data['Artist is Only Songwriter'], width,
+                label='Only Writer', color='#3498DB', edgecolor='black', alpha=0.8)
+    _era_bar_axes(axes[0], 'Artist Songwriting by Era', data['era_labels'])
+    add_p_value(axes[0], data['songwriter_p_value'])
+
+    # Artist as Producer
+    producer_data = data['producer_data']
+    axes[1].bar(x - width / 2, producer_data['Artist is a Producer'], width,
+                label='Co-Produces', color='#E67E22', edgecolor='black', alpha=0.8)
+    axes[1].bar(x + width / 2, producer_data['Artist is Only Producer'], width,
+                label='Only Producer', color='#E74C3C', edgecolor='black', alpha=0.8)
+    _era_bar_axes(axes[1], 'Artist Production by Era', data['era_labels'])
+    add_p_value(axes[1], data['producer_p_value'])
+
+    plt.tight_layout()
+    _save(path, profile)
+
+
+# GENRE EVOLUTION
+
+def render_genre_by_era(data, path, profile=PROFILES['final']):
+    genre_by_era = data['genre_by_era']
+    top_genres = genre_by_era.columns
+
+    fig, ax = plt.subplots(figsize=(14, 8))
+    x = np.arange(len(top_genres))
+    width = 0.25
+
+    for i, era in enumerate(genre_by_era.index):
+        offset = width * (i - 1)
+        ax.bar(x + offset, genre_by_era.loc[era], width, label=era,
+               color=ERA_COLORS[i], edgecolor='black', alpha=0.8)
+
+    ax.set_xlabel('Genre', fontsize=12)
+    ax.set_ylabel('Percentage of #1 Hits', fontsize=12)
+    ax.set_title('Genre Distribution Across Eras', fontsize=14, fontweight='bold')
+    ax.set_xticks(x)
+    ax.set_xticklabels(top_genres, rotation=45, ha='right')
+    ax.legend()
+    ax.grid(True, alpha=0.3, axis='y')
+    plt.tight_layout()
+    _save(path, profile)
+
+
+# MAGNITUDE OF CHANGE
+
+def render_era_changes(data, path, profile=PROFILES['final']):
+    change_df = data['change_df']
+    xerr = None
+    if data.get('ci') is not None:
+        # asymmetric bootstrap CI whiskers, shaped (pairs, 2, metrics)
+        ci = data['ci']
+        xerr = np.array([[(ci['diff'] - ci['ci_low']).xs(pair, level='pair').reindex(change_df.index),
+                          (ci['ci_high'] - ci['diff']).xs(pair, level='pair').reindex(change_df.index)]
+                         for pair in change_df.columns])
+
+    fig, ax = plt.subplots(figsize=(14, 8))
+    change_df.plot(kind='barh', ax=ax, color=['#FF6B6B', '#4ECDC4', '#95E1D3'], edgecolor='black',
+                   width=0.7, xerr=xerr, capsize=3)
+    ax.axvline(0, color='black', linewidth=1)
+    ax.set_xlabel('Change in Metric', fontsize=12)
+    ax.set_title('Magnitude of Change Between Eras', fontsize=14, fontweight='bold')
+    ax.legend(loc='best')
+    ax.grid(True, alpha=0.3, axis='x')
+    plt.tight_layout()
+    _save(path, profile)
+
+
+# ERA COMPARISON
+
+def _yearly_line(ax, yearly, trend=None, linewidth=2, **style):
+    # yearly means as a line, or (with a trend) as faint points under the smoothed trend line
+    if trend is None:
+        ax.plot(yearly.index, yearly.values, linewidth=linewidth, marker='o', markersize=3, **style)
+        return
+    ax.plot(yearly.index, yearly.values, linestyle='none', marker='o', markersize=3, alpha=0.35,
+            color=style.get('color'))
+    ax.plot(trend.index, trend.values, linewidth=linewidth, **style)
+
+
+def render_era_comparison(data, path, profile=PROFILES['final']):
+    boundaries = data['boundaries']
+    trend = data.get('trend') or {}
+    fig = plt.figure(figsize=(16, 12))
+    gs = fig.add_gridspec(3, 2, hspace=0.3, wspace=0.3)
+
+    # 1. Song Length Over Time
+    ax1 = fig.add_subplot(gs[0, :])
+    _yearly_line(ax1, data['yearly_length'], trend.get('length'), color='#2C3E50')
+    title = 'Song Length Evolution'
+    if trend:
+        title += f" (points: yearly means, line: {trend['label']})"
+    _year_axes(ax1, boundaries, 'Average Song Length (minutes)', title, titlesize=13, boundary_label='Era boundaries')
+
+    # 2. Artist Gender Distribution
+    ax2 = fig.add_subplot(gs[1, 0])
+    _yearly_line(ax2, data['yearly_male'], trend.get('male'), label='All Male', color='#3498DB')
+    _yearly_line(ax2, data['yearly_female'], trend.get('female'), label='All Female', color='#E91E63')
+    _year_axes(ax2, boundaries, 'Percentage', 'Artist Gender Distribution Over Time')
+
+    # 3. Artist as Songwriter
+    ax3 = fig.add_subplot(gs[1, 1])
+    _yearly_line(ax3, data['yearly_songwriter'], trend.get('songwriter'), linewidth=2.5, color='#9B59B6')
+    _year_axes(ax3, boundaries, 'Percentage', 'Artists Co-Writing Their Songs', legend=False)
+
+    # 4. Solo vs Group
+    ax4 = fig.add_subplot(gs[2, 0])
+    _yearly_line(ax4, data['yearly_solo'], trend.get('solo'), linewidth=2.5, color='#E74C3C', label='Solo')
+    _yearly_line(ax4, data['yearly_group'], trend.get('group'), linewidth=2.5, color='#27AE60', label='Group')
+    _year_axes(ax4, boundaries, 'Percentage', 'Solo vs Group Artists Over Time')
+
+    # 5. Number of Different #1 Hits Per Year
+    ax5 = fig.add_subplot(gs[2, 1])
+    yearly_count = data['yearly_count']
+    ax5.bar(yearly_count.index, yearly_count.values, alpha=0.7, color='teal', edgecolor='black')
+    _year_axes(ax5, boundaries, 'Count', 'Number of Different #1 Hits Per Year', legend=False, grid_axis='y')
+
+    plt.suptitle('Billboard Hot 100: Comprehensive Era Comparison', fontsize=16, fontweight='bold', y=0.995)
+    _save(path, profile)
+
+
+# figure name -> render function; each is saved as <name>[suffix].<format> of the output profile
+FIGURES = {
+    'song_length': render_song_length,
+    'artist_structure': render_artist_structure,
+    'demographics': render_demographics,
+    'creative_control': render_creative_control,
+    'genre_by_era': render_genre_by_era,
+    'era_changes': render_era_changes,
+    'era_comparison': render_era_comparison,
+}
+
+
+def figure_file(name, profile='final'):
+    profile = PROFILES[profile]
+    return f"{name}{profile['suffix']}.{profile['format']}"
+
+
+def render(name, data, out_dir='.', profile='final'):
+    """Render one figure from its precomputed tables and return the saved path."""
+    path = os.path.join(out_dir, figure_file(name, profile))
+    FIGURES[name](data, path, PROFILES[profile])
+    return path
+
+
+def figure_fingerprint(name, data, profile='final'):
+    """Fingerprint of everything that goes into a figure: its tables, style, output profile and plotting code."""
+    style = {'era_colors': ERA_COLORS, 'era_short_names': ERA_SHORT_NAMES, 'profile': PROFILES[profile],
+             'matplotlib': matplotlib.__version__, 'seaborn': sns.__version__}
+    return fingerprint(name, data, style, code_version(sys.modules[__name__]))
+
+
+def render_all(inputs, out_dir='.', profile='final', jobs=1, force=False):
+    """Render every figure in `inputs` ({name: tables}), yielding (path, rendered) in a fixed order.
+
+    profile names an entry of PROFILES (png at 300 dpi, quick 72-dpi previews, svg or pdf).
+    Figures whose fingerprint matches the manifest in out_dir are skipped (rendered=False)
+    unless force is set. With jobs > 1 the figures are drawn on a process pool; each worker
+    only receives the tables for its own figure.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = Manifest(out_dir)
+    names = [name for name in FIGURES if name in inputs]
+    files = {name: figure_file(name, profile) for name in names}
+    fps = {name: figure_fingerprint(name, inputs[name], profile) for name in names}
+    stale = [name for name in names if force or not manifest.is_current(files[name], fps[name])]
+
+    if jobs <= 1 or len(stale) <= 1:
+        if stale:
+            setup_style()
+        for name in names:
+            if name in stale:
+                path = render(name, inputs[name], out_dir, profile)
+                manifest.record(files[name], fps[name])
+                yield path, True
+            else:
+                yield os.path.join(out_dir, files[name]), False
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(stale)), initializer=setup_style) as pool:
+        futures = {name: pool.submit(render, name, inputs[name], out_dir, profile) for name in stale}
+        for name in names:
+            if name in futures:
+                path = futures[name].result()
+                manifest.record(files[name], fps[name])
+                yield path, True
+            else:
+                yield os.path.join(out_dir, files[name]), False
@@ -0,0 +1,212 @@
+import hashlib
+import io
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# only these columns are ever used, so nothing else gets parsed
+COLS = ['Date', 'Weeks at Number One', 'Label', 'Parent Label',
+        'Discogs Genre', 'Discogs Style', 'Artist Structure', 'Multiple Lead Vocalists',
+        'Front Person Age', 'Artist Male', 'Artist White', 'Artist Black',
+        'Songwriter Male', 'Songwriter White',
+        'Artist is a Songwriter', 'Artist is Only Songwriter',
+        'Producer Male', 'Producer White', 'Artist is a Producer', 'Artist is Only Producer',
+        'Length (Sec)']
+
+TEXT_COLS = ['Label', 'Parent Label', 'Discogs Genre', 'Discogs Style']
+
+# explicit dtypes so read_csv never has to infer; numeric codes stay float so NaNs survive
+DTYPES = {col: (str if col in TEXT_COLS else 'float64') for col in COLS if col != 'Date'}
+
+# compact schema: text as categoricals (a small integer code per row plus each distinct
+# string once); numbers are downcast as they are read, see read_source()
+COMPACT_DTYPES = {**DTYPES, **{col: 'category' for col in TEXT_COLS}}
+# rows parsed at a time for the compact schema, so only this many rows ever exist as float64
+COMPACT_CHUNK = 200_000
+
+# bump whenever COLS/DTYPES or the post-processing in read_source changes
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = '.billboard_cache'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_source(path, compact=False):
+    """Parse the raw chart CSV: used columns only, typed and date-sorted.
+
+    compact: parse the text columns straight into categoricals and the numbers into the
+    smallest exact dtypes (see compact_dtypes()), chunk by chunk.
+    """
+    if compact:
+        df = _read_compact(path)
+    else:
+        df = pd.read_csv(path, usecols=COLS, dtype=DTYPES, parse_dates=['Date'])
+    # the export is already chronological, and sorting builds a second copy of every column
+    if not df['Date'].is_monotonic_increasing:
+        df.sort_values('Date', inplace=True, ignore_index=True)
+    return df
+
+
+def _read_compact(path, chunksize=COMPACT_CHUNK):
+    # each chunk's floats go to float32 where that is exact before the next chunk is parsed, so
+    # whole float64 columns never exist; the columns are then joined and narrowed once more
+    parts = []
+    with pd.read_csv(path, usecols=COLS, dtype=COMPACT_DTYPES, parse_dates=['Date'], chunksize=chunksize) as reader:
+        for chunk in reader:
+            for col in chunk.columns:
+                if chunk[col].dtype == np.float64 and _smallest_dtype(chunk[col].to_numpy()) != np.float64:
+                    chunk[col] = chunk[col].astype(np.float32)
+            parts.append(chunk)
+    columns = {}
+    for col in COLS:
+        pieces = [part.pop(col) for part in parts]
+        if isinstance(pieces[0].dtype, pd.CategoricalDtype):
+            columns[col] = pd.api.types.union_categoricals(pieces)
+        else:
+            columns[col] = pd.concat(pieces, ignore_index=True)
+        del pieces
+    df = pd.DataFrame(columns)
+    compact_dtypes(df)
+    return df
+
+
+def _smallest_dtype(values):
+    # smallest dtype holding every value exactly: ints when there are no NaNs, else float32/64
+    if values.dtype.kind == 'f':
+        finite = values[~np.isnan(values)]
+        integral = len(finite) == len(values) and np.array_equal(finite, np.trunc(finite))
+    else:
+        finite, integral = values, True
+    if integral and len(finite):
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if info.min <= finite.min() and finite.max() <= info.max:
+                return np.dtype(dtype)
+    elif values.dtype == np.float64 and np.array_equal(finite.astype(np.float32), finite):
+        return np.dtype(np.float32)
+    return values.dtype
+
+
+def compact_dtypes(df):
+    """Shrink df's columns in place, one column at a time, and report the saving.
+
+    Text columns become categoricals; numeric columns get the smallest dtype that holds
+    every value exactly (int8/16/32 without NaNs, float32 when that is lossless). Returns
+    a per-column table of dtype and MB before and after, with a total row. Source columns
+    that read_source(compact=True) already read compact are measured as the DTYPES columns
+    they replace.
+    """
+    rows = {}
+    for col in df.columns:
+        s = df[col]
+        if col in TEXT_COLS and isinstance(s.dtype, pd.CategoricalDtype):
+            before = s.astype(DTYPES[col])
+            dtype_before, mb_before = str(before.dtype), before.memory_usage(deep=True, index=False)
+            del before
+        elif DTYPES.get(col) == 'float64' and s.dtype != np.float64:
+            dtype_before, mb_before = 'float64', len(s) * 8
+        else:
+            dtype_before, mb_before = str(s.dtype), s.memory_usage(deep=True, index=False)
+        if col in TEXT_COLS or s.dtype == object or isinstance(s.dtype, pd.StringDtype):
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                df[col] = s.astype('category')
+        elif s.dtype.kind in 'iuf':
+            dtype = _smallest_dtype(s.to_numpy())
+            if dtype != s.dtype:
+                df[col] = s.astype(dtype)
+        rows[col] = {'dtype before': dtype_before, 'MB before': mb_before,
+                     'dtype': str(df[col].dtype), 'MB': df[col].memory_usage(deep=True, index=False)}
+        del s
+    report = pd.DataFrame.from_dict(rows, orient='index')
+    report.loc['total'] = ['', report['MB before'].sum(), '', report['MB'].sum()]
+    report[['MB before', 'MB']] = report[['MB before', 'MB']].astype('float64') / 2 ** 20
+    return report
+
+
+def iter_chunks(path, chunksize=500_000):
+    """Yield the used columns of the CSV, typed, `chunksize` rows at a time (in file order)."""
+    with pd.read_csv(path, usecols=COLS, dtype=DTYPES, parse_dates=['Date'], chunksize=chunksize) as reader:
+        yield from reader
+
+
+def tail_hash(path, end, size=4096):
+    """sha256 of the `size` bytes before byte `end`: checks that a file only grew past `end`."""
+    with open(path, 'rb') as f:
+        f.seek(max(end - size, 0))
+        return hashlib.sha256(f.read(end - max(end - size, 0))).hexdigest()
+
+
+def read_appended(path, start, end=None):
+    """The rows written to the CSV between bytes start and end (default: the end of the file).
+
+    Typed like read_source(), but only the appended bytes (plus the header line) are parsed.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        data = f.read() if end is None else f.read(end - start)
+    return pd.read_csv(io.BytesIO(header + data), usecols=COLS, dtype=DTYPES, parse_dates=['Date'])
+
+
+def _cache_prefix(path, compact=False):
+    # <stem>-<hash of the absolute path>: files with the same name in other directories are other sources
+    stem = os.path.splitext(os.path.basename(path))[0]
+    source = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]
+    schema = '-compact' if compact else ''
+    return f'{stem}-{source}-v{CACHE_VERSION}{schema}-'
+
+
+def cache_path(path, cache_dir=DEFAULT_CACHE_DIR, compact=False):
+    return os.path.join(cache_dir, f'{_cache_prefix(path, compact)}{file_hash(path)[:16]}.parquet')
+
+
+def load_data(path, cache_dir=DEFAULT_CACHE_DIR, compact=False):
+    """Load the chart data, reusing a Parquet copy when the source file hasn't changed.
+
+    Pass cache_dir=None to always parse the CSV. Without pyarrow the cache is skipped.
+    compact: text columns as categoricals (the cache keeps them that way).
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        cache_dir = None
+    if cache_dir is None:
+        return read_source(path, compact)
+
+    cached = cache_path(path, cache_dir, compact)
+    try:
+        return pd.read_parquet(cached)
+    except FileNotFoundError:  # not cached yet, or pruned by another run since the source changed
+        pass
+
+    df = read_source(path, compact)
+    os.makedirs(cache_dir, exist_ok=True)
+    # per process, so concurrent batch workers never write into each other's temporary file
+    tmp = f'{cached}.{os.getpid()}.tmp'
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, cached)
+    prune_cache(path, cached, compact)
+    return df
+
+
+def prune_cache(path, cached, compact=False):
+    """Delete cached copies of earlier contents of path (same source and schema) next to `cached`, its current one.
+
+    The source is updated weekly, and each change would otherwise leave a full stale copy behind.
+    """
+    cache_dir, keep = os.path.split(cached)
+    pattern = re.compile(re.escape(_cache_prefix(path, compact)) + r'[0-9a-f]{16}\.parquet')
+    for entry in os.listdir(cache_dir):
+        if entry != keep and pattern.fullmatch(entry):
+            try:
+                os.remove(os.path.join(cache_dir, entry))
+            except FileNotFoundError:  # another run pruned it first
+                pass
@@ -0,0 +1,118 @@
+"""Named timing/memory spans around the stages of a run, with a machine-readable report."""
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class Instrumentation:
+    """Records wall time, CPU time, peak RSS and (optionally) tracemalloc peaks per span.
+
+    trace_memory: also track Python allocations with tracemalloc (slows the run down).
+    cprofile_dir: dump a cProfile of every span to <dir>/<span>.prof.
+    """
+
+    def __init__(self, trace_memory=False, cprofile_dir=None):
+        self.trace_memory = trace_memory
+        self.cprofile_dir = cprofile_dir
+        self.spans = []
+        self._stack = []
+        # per open span: the tracemalloc peak before its children's resets, its profiler and its children's stats
+        self._open = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def span(self, name, rows=None):
+        """Time the enclosed block. The yielded dict can be updated, e.g. record['rows'] = n.
+
+        Spans nest: a parent's memory peak and profile include its children's.
+        """
+        record = {'name': name, 'parent': self._stack[-1]['name'] if self._stack else None, 'rows': rows}
+        parent = self._open[-1] if self._open else None
+        state = {'peak': 0, 'profiler': None, 'children': []}
+        self._stack.append(record)
+        self._open.append(state)
+
+        if self.cprofile_dir:
+            import cProfile
+            # only one profiler can be active (an error from Python 3.12), so the parent's pauses
+            # while this span runs and gets this span's stats added to its own at the end
+            if parent and parent['profiler']:
+                parent['profiler'].disable()
+            state['profiler'] = cProfile.Profile()
+        if self.trace_memory:
+            # reset_peak() below would lose the parent's peak so far: keep it aside
+            if parent:
+                parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            traced_start = tracemalloc.get_traced_memory()[0]
+        rss_start = peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if state['profiler']:
+            state['profiler'].enable()
+        try:
+            yield record
+        finally:
+            if state['profiler']:
+                state['profiler'].disable()
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = time.process_time() - cpu
+            record['peak_rss_mb'] = peak_rss_mb()
+            if rss_start is not None:
+                record['peak_rss_growth_mb'] = record['peak_rss_mb'] - rss_start
+            if self.trace_memory:
+                peak = max(state['peak'], tracemalloc.get_traced_memory()[1])
+                record['traced_peak_mb'] = (peak - traced_start) / 2 ** 20
+            if state['profiler']:
+                import pstats
+
+                stats = pstats.Stats(state['profiler'])
+                for child in state['children']:
+                    stats.add(child)
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                stats.dump_stats(os.path.join(self.cprofile_dir, f"{name.replace(':', '_')}.prof"))
+                if parent and parent['profiler']:
+                    parent['children'].append(stats)
+                    parent['profiler'].enable()
+            self._open.pop()
+            self._stack.pop()
+            self.spans.append(record)
+
+    def report(self):
+        return {
+            'pid': os.getpid(),
+            'python': sys.version.split()[0],
+            'peak_rss_mb': peak_rss_mb(),
+            'spans': self.spans,
+        }
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2, default=str)
+
+    def summary(self):
+        lines = [f"{'stage':<28}{'wall s':>9}{'cpu s':>9}{'rss MB':>9}{'rows':>12}"]
+        for s in self.spans:
+            name = ('  ' if s['parent'] else '') + s['name']
+            rows = '' if s['rows'] is None else s['rows']
+            rss = s.get('peak_rss_mb')
+            lines.append(f"{name:<28}{s['wall_s']:>9.3f}{s['cpu_s']:>9.3f}"
+                         f"{'' if rss is None else format(rss, '.0f'):>9}{rows:>12}")
+        return '\n'.join(lines)
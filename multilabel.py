@@ -0,0 +1,183 @@
+"""Sparse multi-label encoding of the comma-separated Discogs Genre / Style fields.
+
+Each distinct field value is split once into labels of a shared Vocabulary, giving a
+(distinct values x labels) 0/1 matrix U. Rows never get split: with R the (rows x distinct
+values) one-hot matrix, the row encoding is R @ U, per-era label counts are (E.T @ R) @ U
+for an era indicator E, and label co-occurrence is U.T @ diag(value counts) @ U.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Discogs genres whose own name contains the separator
+COMPOUND_LABELS = ['Folk, World, & Country']
+
+
+def split_labels(value, sep=', '):
+    """The distinct labels of one field value, in order."""
+    placeholders = {}
+    for i, label in enumerate(COMPOUND_LABELS):
+        if label in value:
+            placeholders[f'\0{i}\0'] = label
+            value = value.replace(label, f'\0{i}\0')
+    labels = [placeholders.get(part.strip(), part.strip()) for part in value.split(sep)]
+    return list(dict.fromkeys(label for label in labels if label))
+
+
+class Vocabulary:
+    """Label <-> column index, growing as new labels turn up (shared across chunks)."""
+
+    def __init__(self, tokens=()):
+        self.tokens = []
+        self.index = {}
+        for token in tokens:
+            self.add(token)
+
+    def add(self, token):
+        if token not in self.index:
+            self.index[token] = len(self.tokens)
+            self.tokens.append(token)
+        return self.index[token]
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+def _value_matrix(uniques, vocab, sep=', '):
+    # (distinct values x vocab) 0/1 matrix; the only Python loop is over distinct values
+    rows, cols = [], []
+    for i, value in enumerate(uniques):
+        for label in split_labels(value, sep):
+            rows.append(i)
+            cols.append(vocab.add(label))
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(len(uniques), len(vocab)))
+
+
+def _one_hot(codes, width):
+    # (len(codes) x width) indicator of codes; code -1 (missing) gives an empty row
+    present = codes >= 0
+    return sparse.csr_matrix((np.ones(present.sum(), dtype=np.int64), (np.flatnonzero(present), codes[present])),
+                             shape=(len(codes), width))
+
+
+def encode(values, vocab=None, sep=', '):
+    """(rows x labels) sparse 0/1 matrix of a multi-valued text column, and its Vocabulary."""
+    vocab = Vocabulary() if vocab is None else vocab
+    codes, uniques = pd.factorize(values)
+    u = _value_matrix(uniques, vocab, sep)
+    return _one_hot(codes, len(uniques)) @ u, vocab
+
+
+def _resized(matrix, shape):
+    matrix = matrix.tocsr()
+    matrix.resize(shape)
+    return matrix
+
+
+class LabelCounts:
+    """Per-group label counts and label co-occurrence of a multi-valued column, mergeable.
+
+    counts: (groups x labels) rows per group carrying each label; pairs: {group: (labels x
+    labels) co-occurrence}, whose diagonal is that group's label counts. Groups and labels
+    each have a Vocabulary, so chunks with different labels line up.
+    """
+
+    def __init__(self, column, key='Era', sep=', '):
+        self.column = column
+        self.key = key
+        self.sep = sep
+        self.vocab = Vocabulary()
+        self.groups = Vocabulary()
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.int64)
+        self.pairs = {}
+        self.rows = np.zeros(0, dtype=np.int64)
+
+    def _grow(self):
+        shape = (len(self.groups), len(self.vocab))
+        self.counts = _resized(self.counts, shape)
+        self.pairs = {g: _resized(m, (shape[1], shape[1])) for g, m in self.pairs.items()}
+        self.rows = np.pad(self.rows, (0, shape[0] - len(self.rows)))
+
+    def update(self, chunk):
+        group_codes, group_names = pd.factorize(chunk[self.key])
+        to_group = np.array([self.groups.add(g) for g in group_names], dtype=np.int64)
+        codes, uniques = pd.factorize(chunk[self.column])
+        u = _value_matrix(uniques, self.vocab, self.sep)
+        self._grow()
+
+        in_group = group_codes >= 0
+        groups, codes = to_group[group_codes[in_group]], codes[in_group]
+        self.rows += np.bincount(groups, minlength=len(self.groups))
+        labelled = codes >= 0
+        # (groups x distinct values) row counts; the label counts follow through U
+        by_value = sparse.csr_matrix((np.ones(labelled.sum(), dtype=np.int64), (groups[labelled], codes[labelled])),
+                                     shape=(len(self.groups), len(uniques)))
+        self.counts = self.counts + by_value @ u
+        for g in np.unique(groups[labelled]):
+            weights = sparse.diags(by_value.getrow(g).toarray().ravel(), dtype=np.int64)
+            self._add_pairs(self.groups.tokens[g], u.T @ weights @ u)
+        return self
+
+    def merge(self, other):
+        # other's label/group indices -> ours, as 0/1 mapping matrices
+        labels = _one_hot(np.array([self.vocab.add(t) for t in other.vocab.tokens], dtype=np.int64), len(self.vocab))
+        groups = np.array([self.groups.add(g) for g in other.groups.tokens], dtype=np.int64)
+        self._grow()
+        self.counts = self.counts + _one_hot(groups, len(self.groups)).T @ other.counts @ labels
+        self.rows += np.bincount(groups, weights=other.rows, minlength=len(self.groups)).astype(np.int64)
+        for group, pairs in other.pairs.items():
+            self._add_pairs(group, labels.T @ pairs @ labels)
+        return self
+
+    def _add_pairs(self, group, pairs):
+        self.pairs[group] = self.pairs[group] + pairs if group in self.pairs else pairs.tocsr()
+
+    # -- tables ----------------------------------------------------------------
+
+    def _order(self, totals, top):
+        # label indices by count (descending, ties by name), only the top k when asked
+        idx = np.arange(len(totals))
+        if top is not None and top < len(totals):
+            idx = np.argpartition(-totals, top - 1)[:top]
+            # keep every label tied with the k-th so the tie-break below decides
+            idx = np.flatnonzero(totals >= totals[idx].min())
+        names = np.array(self.vocab.tokens, dtype=object)[idx]
+        idx = idx[np.lexsort((names, -totals[idx]))]
+        return idx if top is None else idx[:top]
+
+    def totals(self, top=None):
+        """Rows carrying each label, most common first."""
+        totals = np.asarray(self.counts.sum(axis=0)).ravel()
+        idx = self._order(totals, top)
+        return pd.Series(totals[idx], index=pd.Index(np.array(self.vocab.tokens, dtype=object)[idx], name=self.column),
+                         name='rows')
+
+    def shares(self, top=None):
+        """% of each group's rows carrying each label; columns are the overall top labels."""
+        totals = np.asarray(self.counts.sum(axis=0)).ravel()
+        idx = self._order(totals, top)
+        counts = self.counts[:, idx].toarray()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = counts / self.rows[:, None] * 100
+        return pd.DataFrame(pct, index=pd.Index(self.groups.tokens, name=self.key),
+                            columns=pd.Index(np.array(self.vocab.tokens, dtype=object)[idx], name=self.column))
+
+    def cooccurrence(self, group=None):
+        """Sparse (labels x labels) rows carrying both labels, for one group or all of them."""
+        n = len(self.vocab)
+        if group is not None:
+            return self.pairs.get(group, sparse.csr_matrix((n, n), dtype=np.int64))
+        return sum(self.pairs.values(), sparse.csr_matrix((n, n), dtype=np.int64))
+
+    def top_pairs(self, k=20, group=None):
+        """The k most frequent label pairs, with their count and % of rows (of the group)."""
+        pairs = sparse.triu(self.cooccurrence(group), k=1).tocoo()
+        names = np.array(self.vocab.tokens, dtype=object)
+        order = np.lexsort((names[pairs.col], names[pairs.row], -pairs.data))[:k]
+        rows = self.rows.sum() if group is None else self.rows[self.groups.index[group]]
+        return pd.DataFrame({
+            'label': names[pairs.row[order]],
+            'with': names[pairs.col[order]],
+            'rows': pairs.data[order],
+            '% of hits': pairs.data[order] / rows * 100,
+        })
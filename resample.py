@@ -0,0 +1,111 @@
+"""Bootstrap confidence intervals and permutation p-values for differences of era means.
+
+Resamples are drawn a batch at a time as NumPy arrays, never in a Python loop per resample.
+Columns with few distinct values (the 0/1 flags, weeks at #1, ages) are resampled through
+their value counts: a bootstrap sample's counts are multinomial and a permutation's split of
+the pooled counts is multivariate hypergeometric, which gives the same distribution of means
+as resampling rows at a cost independent of the number of rows.
+"""
+import numpy as np
+import pandas as pd
+
+# max elements per (resamples x rows) index batch, ~64 MB of int64
+BATCH_ELEMS = 8_000_000
+
+
+def _compress(values):
+    values, counts = np.unique(values, return_counts=True)
+    return values.astype('float64'), counts
+
+
+def _use_counts(k, n):
+    # resampling counts costs O(k) per draw, resampling rows O(n)
+    return k * 4 <= n
+
+
+def bootstrap_means(values, n_resamples, rng):
+    """Means of n_resamples bootstrap samples of values."""
+    n = len(values)
+    uniq, counts = _compress(values)
+    if _use_counts(len(uniq), n):
+        draws = rng.multinomial(n, counts / n, size=n_resamples)
+        return draws @ uniq / n
+
+    values = np.asarray(values, dtype='float64')
+    out = np.empty(n_resamples)
+    step = max(1, BATCH_ELEMS // n)
+    for start in range(0, n_resamples, step):
+        stop = min(start + step, n_resamples)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        out[start:stop] = values[idx].mean(axis=1)
+    return out
+
+
+def permutation_diffs(a, b, n_resamples, rng):
+    """mean(b) - mean(a) under n_resamples random relabellings of the pooled values."""
+    n_a, n_b = len(a), len(b)
+    pooled = np.concatenate([a, b]).astype('float64')
+    total = pooled.sum()
+    uniq, counts = _compress(pooled)
+    if _use_counts(len(uniq), len(pooled)):
+        draws_a = rng.multivariate_hypergeometric(counts, n_a, size=n_resamples)
+        sum_a = draws_a @ uniq
+        return (total - sum_a) / n_b - sum_a / n_a
+
+    out = np.empty(n_resamples)
+    step = max(1, BATCH_ELEMS // len(pooled))
+    for start in range(0, n_resamples, step):
+        stop = min(start + step, n_resamples)
+        perms = rng.permuted(np.broadcast_to(pooled, (stop - start, len(pooled))), axis=1)
+        sum_a = perms[:, :n_a].sum(axis=1)
+        out[start:stop] = (total - sum_a) / n_b - sum_a / n_a
+    return out
+
+
+def compare(a, b, n_resamples, seed, confidence=0.95):
+    """Observed mean(b) - mean(a) with a percentile bootstrap CI and a two-sided permutation p-value."""
+    a = np.asarray(a, dtype='float64')
+    b = np.asarray(b, dtype='float64')
+    if len(a) == 0 or len(b) == 0:
+        return {'diff': np.nan, 'ci_low': np.nan, 'ci_high': np.nan, 'p_value': np.nan}
+
+    rng = np.random.default_rng(seed)
+    observed = b.mean() - a.mean()
+    boot = bootstrap_means(b, n_resamples, rng) - bootstrap_means(a, n_resamples, rng)
+    alpha = (1 - confidence) / 2
+    ci_low, ci_high = np.quantile(boot, [alpha, 1 - alpha])
+
+    perm = permutation_diffs(a, b, n_resamples, rng)
+    # small tolerance so ties with the observed value count as "at least as extreme"
+    extreme = np.abs(perm) >= np.abs(observed) - 1e-12
+    p_value = (extreme.sum() + 1) / (n_resamples + 1)
+    return {'diff': observed, 'ci_low': ci_low, 'ci_high': ci_high, 'p_value': p_value}
+
+
+def _compare_task(args):
+    return compare(*args)
+
+
+def resample_era_changes(groups, pairs, n_resamples=10_000, seed=0, jobs=1, confidence=0.95):
+    """Bootstrap CIs and permutation p-values for every metric and era pair.
+
+    groups: {metric: {era: 1-d array of non-null values}}
+    pairs: {pair label: (from era, to era)}; the difference is to - from.
+    Returns a DataFrame indexed by (metric, pair) with diff, ci_low, ci_high and p_value.
+    Every (metric, pair) gets its own child seed of `seed`, so results don't depend on jobs.
+    """
+    keys = [(metric, label) for metric in groups for label in pairs]
+    seeds = np.random.SeedSequence(seed).spawn(len(keys))
+    tasks = [(groups[metric][pairs[label][0]], groups[metric][pairs[label][1]], n_resamples, s, confidence)
+             for (metric, label), s in zip(keys, seeds)]
+
+    if jobs <= 1:
+        results = [_compare_task(task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_compare_task, tasks))
+
+    index = pd.MultiIndex.from_tuples(keys, names=['metric', 'pair'])
+    return pd.DataFrame(results, index=index, columns=['diff', 'ci_low', 'ci_high', 'p_value'])
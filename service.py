@@ -0,0 +1,199 @@
+"""Local HTTP/JSON query service over the precomputed tables and the aggregate cube.
+
+    GET /tables                 names of the precomputed tables
+    GET /tables/<name>          one of them (structure_by_era, gender_by_era, change_df, yearly, ...)
+    GET /query?by=Era&columns=Solo_Artist,Group[&stat=mean][&Discogs Genre=Pop&Decade=1980]
+                                an ad-hoc grouped table summed out of the cube; any other
+                                parameter filters on a key (repeat it or use commas for several values)
+    GET /health                 rows, cells, when the data was loaded, the last reload error and cache hit counts
+
+Tables are JSON in pandas' 'split' layout (index, columns, data). The data is loaded once;
+results are kept in an LRU cache, and both are refreshed when the source file changes.
+"""
+import json
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+
+class LRUCache:
+    """A dict that keeps the `maxsize` most recently used entries."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class QueryError(ValueError):
+    """A bad request; the message is sent back with a 400."""
+
+
+def _table_json(table):
+    if isinstance(table, pd.Series):
+        table = table.to_frame()
+    return json.loads(table.to_json(orient='split'))
+
+
+class QueryService:
+    """Answers queries from a (cube, {name: table}) snapshot made by load(path).
+
+    The source file's mtime and size are checked at most every check_interval seconds, and
+    a changed file is reloaded (and the result cache dropped) before the next answer. If the
+    changed file can't be loaded (half-written or corrupt), the previous snapshot is kept and
+    the error is shown in /health until the file changes again.
+    """
+
+    def __init__(self, path, load, cache_size=256, check_interval=1.0):
+        self.path = path
+        self._load = load
+        self.cache = LRUCache(cache_size)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked = 0.0
+        self.load_error = None
+        self.reload()
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self):
+        with self._lock:
+            signature = self._stat()
+            try:
+                self.cube, self.tables = self._load(self.path)
+            finally:
+                # a file that fails to load isn't retried until it changes again
+                self._signature = signature
+            self.loaded_at = time.time()
+            self.load_error = None
+            self.cache.clear()
+
+    def refresh(self):
+        """Reload if the source changed since the last check (cheap: one stat per interval)."""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+        try:
+            changed = self._stat() != self._signature
+        except OSError:
+            return False  # mid-replace or deleted: keep serving what we have
+        if changed:
+            try:
+                self.reload()
+            except Exception as e:
+                self.load_error = f'{type(e).__name__}: {e}'
+                return False
+        return changed
+
+    def answer(self, path, params):
+        """JSON-ready result for a request path and its {param: [values]}."""
+        self.refresh()
+        if path == '/health':
+            return {'source': self.path, 'rows': self.cube.rows, 'cells': self.cube.cells,
+                    'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at)),
+                    'load_error': self.load_error,
+                    'cache': {'size': len(self.cache), 'hits': self.cache.hits, 'misses': self.cache.misses}}
+
+        key = (path, tuple(sorted((name, tuple(values)) for name, values in params.items())))
+        with self._lock:
+            result = self.cache.get(key)
+            if result is None:
+                result = self._compute(path, params)
+                self.cache.put(key, result)
+        return result
+
+    def _compute(self, path, params):
+        if path == '/tables':
+            return sorted(self.tables)
+        if path.startswith('/tables/'):
+            name = path[len('/tables/'):]
+            if name not in self.tables:
+                raise KeyError(name)
+            return _table_json(self.tables[name])
+        if path == '/query':
+            return _table_json(self._query(params))
+        raise KeyError(path)
+
+    def _query(self, params):
+        params = {name: [v for value in values for v in value.split(',') if v] for name, values in params.items()}
+        by = params.pop('by', [])
+        columns = params.pop('columns', [])
+        stat = (params.pop('stat', None) or ['mean'])[0]
+        if not by:
+            raise QueryError("'by' is required, e.g. by=Era or by=Year,Artist Structure")
+        try:
+            cube = self.cube.subset(params) if params else self.cube
+            if stat == 'size':
+                return cube.sizes(by)
+            if not columns:
+                raise QueryError("'columns' is required unless stat=size")
+            return cube.table(by, columns, stat)
+        except (KeyError, ValueError) as e:
+            raise QueryError(str(e).strip('"')) from None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = unquote(url.path).rstrip('/') or '/'
+        try:
+            status, body = 200, self.service.answer(path, parse_qs(url.query))
+        except QueryError as e:
+            status, body = 400, {'error': str(e)}
+        except KeyError as e:
+            status, body = 404, {'error': f'not found: {e.args[0]}'}
+        except Exception as e:
+            traceback.print_exc()
+            status, body = 500, {'error': f'{type(e).__name__}: {e}'}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(service, host='127.0.0.1', port=8000):
+    """Serve service over HTTP until interrupted."""
+    handler = type('Handler', (_Handler,), {'service': service})
+    with ThreadingHTTPServer((host, port), handler) as server:
+        print(f"serving {service.path} on http://{host}:{server.server_port}/ (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,266 @@
+"""Mergeable accumulators for running the analysis over data read in chunks.
+
+Every accumulator has update(chunk) and merge(other), and only keeps per-group totals,
+so memory depends on the number of groups/bins, not on the number of rows.
+"""
+import numpy as np
+import pandas as pd
+
+from aggregate import AggregationResult
+
+
+def _plain_index(obj):
+    # categorical group labels (Era) don't align well across chunks; plain labels do
+    if isinstance(obj.index.dtype, pd.CategoricalDtype):
+        obj = obj.set_axis(obj.index.astype(object), axis=0)
+    return obj
+
+
+def _add(a, b):
+    if a is None:
+        return b
+    return a.add(b, fill_value=0)
+
+
+class Moments:
+    """Non-null count, sum and sum of squares of columns per group, plus group sizes."""
+
+    def __init__(self, key, columns):
+        self.key = key
+        self.columns = list(columns)
+        self.count = self.sum = self.sumsq = self.size = None
+
+    def update(self, chunk):
+        keys = chunk[self.key]
+        part = Moments(self.key, self.columns)
+        part.size = _plain_index(keys.groupby(keys, observed=True).size())
+        if not self.columns:
+            return self.merge(part)
+        values = chunk[self.columns].astype('float64')
+        part.count = _plain_index(values.groupby(keys, observed=True).count())
+        part.sum = _plain_index(values.groupby(keys, observed=True).sum())
+        part.sumsq = _plain_index((values ** 2).groupby(keys, observed=True).sum())
+        return self.merge(part)
+
+    def merge(self, other):
+        self.count = _add(self.count, other.count)
+        self.sum = _add(self.sum, other.sum)
+        self.sumsq = _add(self.sumsq, other.sumsq)
+        self.size = _add(self.size, other.size)
+        return self
+
+    def mean(self):
+        return (self.sum / self.count.where(self.count > 0)).sort_index()
+
+    def var(self, ddof=1):
+        n = self.count.where(self.count > ddof)
+        return ((self.sumsq - self.sum ** 2 / self.count) / (n - ddof)).sort_index()
+
+
+class Crosstab:
+    """Joint counts of two columns, i.e. an incrementally built pd.crosstab."""
+
+    def __init__(self, row, col):
+        self.row = row
+        self.col = col
+        self.counts = None
+
+    def update(self, chunk):
+        part = chunk.groupby([chunk[self.row], chunk[self.col]], observed=True).size()
+        if isinstance(part.index.levels[0].dtype, pd.CategoricalDtype):
+            part.index = part.index.set_levels(part.index.levels[0].astype(object), level=0)
+        self.counts = _add(self.counts, part)
+        return self
+
+    def merge(self, other):
+        self.counts = _add(self.counts, other.counts)
+        return self
+
+    def table(self):
+        table = self.counts.unstack(fill_value=0).astype('int64')
+        return table.sort_index().sort_index(axis=1)
+
+
+class Histogram:
+    """Per-group counts of a column on unit-width bins, plus exact per-group min/max.
+
+    The bins start out covering [lo, hi] and widen whenever a chunk (or a merged histogram)
+    holds values outside them, so nothing is clipped. Values must be whole numbers (song
+    lengths in seconds), which the bins then hold exactly; anything else raises ValueError.
+    """
+
+    def __init__(self, key, column, lo=0, hi=1800):
+        self.key = key
+        self.column = column
+        self.lo = lo
+        self.values = np.arange(lo, hi + 1, dtype='float64')
+        self.counts = {}
+        self.min = {}
+        self.max = {}
+
+    @property
+    def hi(self):
+        return self.lo + len(self.values) - 1
+
+    def update(self, chunk):
+        data = chunk[[self.key, self.column]].dropna()
+        values = data[self.column].to_numpy(dtype='float64')
+        if not len(values):
+            return self
+        whole = np.rint(values)
+        if not np.array_equal(values, whole):
+            bad = values[values != whole][0]
+            raise ValueError(f'{self.column} must hold whole numbers to be binned exactly, got {bad}')
+        self._grow(int(whole.min()), int(whole.max()))
+        idx = whole.astype(np.int64) - self.lo
+        for group, rows in data.groupby(self.key, observed=True).indices.items():
+            counts = np.bincount(idx[rows], minlength=len(self.values))
+            self.add_group(group, counts, values[rows].min(), values[rows].max())
+        return self
+
+    def merge(self, other):
+        for group, counts in other.counts.items():
+            self.add_group(group, counts, other.min[group], other.max[group], start=other.lo)
+        return self
+
+    def _grow(self, lo, hi):
+        # widen the bins to cover [lo, hi], padding every group's counts with empty bins
+        lo, hi = min(self.lo, lo), max(self.hi, hi)
+        if lo == self.lo and hi == self.hi:
+            return
+        self.counts = {group: np.pad(counts, (self.lo - lo, hi - self.hi)) for group, counts in self.counts.items()}
+        self.lo = lo
+        self.values = np.arange(lo, hi + 1, dtype='float64')
+
+    def add_group(self, group, counts, lo, hi, start=None):
+        """Add one group's bin counts and min/max (e.g. saved ones) to this histogram.
+
+        start: the value of counts' first bin (default this histogram's lo).
+        """
+        start = self.lo if start is None else int(start)
+        self._grow(start, start + len(counts) - 1)
+        counts = np.pad(counts, (start - self.lo, self.hi - (start + len(counts) - 1)))
+        if group in self.counts:
+            self.counts[group] = self.counts[group] + counts
+            self.min[group] = min(self.min[group], lo)
+            self.max[group] = max(self.max[group], hi)
+        else:
+            self.counts[group] = counts
+            self.min[group] = lo
+            self.max[group] = hi
+
+    def regroup(self, groups, key):
+        """A new Histogram keyed by `key`, summing this one's groups through {old group: new group}."""
+        out = Histogram(key, self.column, self.lo, self.hi)
+        for group, counts in self.counts.items():
+            if group in groups:
+                out.add_group(groups[group], counts, self.min[group], self.max[group])
+        return out
+
+    def group(self, group):
+        """(bin values, counts) for one group, skipping empty bins."""
+        counts = self.counts.get(group, np.zeros(len(self.values), dtype=np.int64))
+        nonzero = counts > 0
+        return self.values[nonzero], counts[nonzero]
+
+    def range(self):
+        return min(self.min.values()), max(self.max.values())
+
+
+def weighted_percentile(values, counts, q):
+    """np.percentile of np.repeat(values, counts) without expanding it; values must be sorted."""
+    n = counts.sum()
+    cum = np.cumsum(counts)
+    pos = (n - 1) * np.asarray(q, dtype='float64') / 100
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    v_lo = values[np.searchsorted(cum, lo, side='right')]
+    v_hi = values[np.searchsorted(cum, hi, side='right')]
+    return v_lo + (v_hi - v_lo) * (pos - lo)
+
+
+def boxplot_stats_from_counts(values, counts, whis=1.5):
+    """Same dict as matplotlib.cbook.boxplot_stats(np.repeat(values, counts))."""
+    n = counts.sum()
+    if n == 0:
+        return {'fliers': np.array([]), 'mean': np.nan, 'med': np.nan, 'q1': np.nan, 'q3': np.nan,
+                'iqr': np.nan, 'cilo': np.nan, 'cihi': np.nan, 'whislo': np.nan, 'whishi': np.nan}
+
+    stats = {'mean': (values * counts).sum() / n}
+    q1, med, q3 = weighted_percentile(values, counts, [25, 50, 75])
+    iqr = q3 - q1
+    stats['iqr'] = iqr
+    stats['cilo'] = med - 1.57 * iqr / np.sqrt(n)
+    stats['cihi'] = med + 1.57 * iqr / np.sqrt(n)
+
+    loval = q1 - whis * iqr
+    hival = q3 + whis * iqr
+    wiskhi = values[values <= hival]
+    stats['whishi'] = q3 if len(wiskhi) == 0 or wiskhi.max() < q3 else wiskhi.max()
+    wisklo = values[values >= loval]
+    stats['whislo'] = q1 if len(wisklo) == 0 or wisklo.min() > q1 else wisklo.min()
+
+    low = values < stats['whislo']
+    high = values > stats['whishi']
+    stats['fliers'] = np.concatenate([np.repeat(values[low], counts[low]), np.repeat(values[high], counts[high])])
+    stats['q1'], stats['med'], stats['q3'] = q1, med, q3
+    return stats
+
+
+class StreamingAnalysis:
+    """Everything billboard.py needs from the rows, accumulated chunk by chunk.
+
+    Grouped means come from the same AggregationPlan as the in-memory path; the chi-square
+    tables, the genre table and the song-length distribution have their own accumulators.
+    """
+
+    def __init__(self, plan, contingency_cols, genre_col='Discogs Genre', era_col='Era'):
+        self.moments = {}
+        for key, stat, cols in plan.requests():
+            if stat not in ('mean', 'sum', 'count'):
+                raise ValueError(f'{stat!r} cannot be accumulated in streaming mode')
+            if key in self.moments:
+                cols = [c for c in cols if c not in self.moments[key].columns]
+                self.moments[key].columns.extend(cols)
+            else:
+                self.moments[key] = Moments(key, cols)
+        for key in plan.size_keys():
+            self.moments.setdefault(key, Moments(key, []))
+
+        self.crosstabs = {name: Crosstab(era_col, col) for name, col in contingency_cols.items()}
+        self.genre = Crosstab(era_col, genre_col)
+        self.length = Histogram(era_col, 'Length (Sec)')
+        self.rows = 0
+        self.first_date = self.last_date = None
+
+    def update(self, chunk):
+        for acc in [*self.moments.values(), *self.crosstabs.values(), self.genre, self.length]:
+            acc.update(chunk)
+        self.rows += len(chunk)
+        lo, hi = chunk['Date'].min(), chunk['Date'].max()
+        self.first_date = lo if self.first_date is None else min(self.first_date, lo)
+        self.last_date = hi if self.last_date is None else max(self.last_date, hi)
+        return self
+
+    def merge(self, other):
+        for key, acc in other.moments.items():
+            self.moments[key].merge(acc)
+        for name, acc in other.crosstabs.items():
+            self.crosstabs[name].merge(acc)
+        self.genre.merge(other.genre)
+        self.length.merge(other.length)
+        self.rows += other.rows
+        self.first_date = min(d for d in [self.first_date, other.first_date] if d is not None)
+        self.last_date = max(d for d in [self.last_date, other.last_date] if d is not None)
+        return self
+
+    def aggregates(self):
+        tables, sizes = {}, {}
+        for key, acc in self.moments.items():
+            if acc.columns:
+                tables[key, 'mean'] = acc.mean()
+                tables[key, 'sum'] = acc.sum.sort_index()
+                tables[key, 'count'] = acc.count.sort_index()
+            # merged sizes come out float (add with fill_value); as groupby().size() in AggregationPlan
+            sizes[key] = acc.size.sort_index().astype(np.int64).rename(None)
+        return AggregationResult(tables, sizes, {})
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# the modules are flat scripts in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def chart_csv(tmp_path_factory):
+    """A small synthetic chart export (see bench.synthetic_data), shared by the tests."""
+    from bench import synthetic_data
+
+    path = tmp_path_factory.mktemp('data') / 'chart.csv'
+    synthetic_data(3000, seed=1).to_csv(path, index=False)
+    return str(path)
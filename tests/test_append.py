@@ -0,0 +1,86 @@
+"""Appending to a saved cube gives the same cube as rebuilding it from the whole file."""
+import pytest
+
+from billboard import analyze_cube, append_rows, build_cube, differences
+from cube import Cube
+
+
+def _split(chart_csv, fraction=0.6):
+    """(header + the first rows, the remaining rows) as text, cut between two chart dates."""
+    with open(chart_csv) as f:
+        header, *rows = f.readlines()
+    # Song and Date come first and hold no commas
+    cut = int(len(rows) * fraction)
+    date = rows[cut - 1].split(',')[1]
+    while rows[cut].split(',')[1] == date:
+        cut += 1
+    return header + ''.join(rows[:cut]), ''.join(rows[cut:])
+
+
+def _inputs(cube):
+    return analyze_cube(cube)[1]
+
+
+@pytest.fixture
+def grown(chart_csv, tmp_path, monkeypatch):
+    """(path of a CSV holding the first rows, text to append to it)."""
+    monkeypatch.chdir(tmp_path)  # keep the Parquet cache in the test's directory
+    head, tail = _split(chart_csv)
+    path = tmp_path / 'hot100.csv'
+    path.write_text(head)
+    return str(path), tail
+
+
+def test_append_to_grown_source_matches_rebuild(chart_csv, grown, tmp_path):
+    path, tail = grown
+    build_cube(path).save(str(tmp_path / 'state.npz'))
+    with open(path, 'a') as f:
+        f.write(tail)
+    # the saved state, as the append command uses it
+    cube = Cube.load(str(tmp_path / 'state.npz'))
+    before = cube.rows
+    new = append_rows(cube, path)
+    full = build_cube(chart_csv)
+
+    assert len(new) == full.rows - before
+    assert cube.rows == full.rows
+    assert cube.source['offset'] == (tmp_path / 'hot100.csv').stat().st_size
+    assert differences(_inputs(full), _inputs(cube)) == []
+    # nothing new: a second append adds no rows
+    assert len(append_rows(cube, path)) == 0
+
+
+def test_append_file_of_new_weeks_matches_rebuild(chart_csv, grown, tmp_path):
+    path, tail = grown
+    cube = build_cube(path)
+    new_weeks = tmp_path / 'new.csv'
+    # the whole file: rows up to the cube's last date are already in it and are skipped
+    new_weeks.write_text(open(chart_csv).read())
+    append_rows(cube, str(new_weeks))
+    assert differences(_inputs(build_cube(chart_csv)), _inputs(cube)) == []
+
+
+def test_edited_source_is_refused(grown):
+    path, tail = grown
+    cube = build_cube(path)
+    with open(path) as f:
+        header, first, *rest = f.readlines()
+    # an earlier row corrected and new rows appended: the file grew, but not only by appending
+    song = first.split(',')[0]
+    with open(path, 'w') as f:
+        f.write(header + first.replace(song, song + ' (Remix)', 1) + ''.join(rest) + tail)
+    rows = cube.rows
+    with pytest.raises(ValueError, match='not just appended to'):
+        append_rows(cube, path)
+    assert cube.rows == rows
+
+
+def test_truncated_source_is_refused(grown):
+    path, tail = grown
+    cube = build_cube(path)
+    with open(path) as f:
+        lines = f.readlines()
+    with open(path, 'w') as f:
+        f.write(''.join(lines[:-5]))
+    with pytest.raises(ValueError, match='not just appended to'):
+        append_rows(cube, path)
@@ -0,0 +1,25 @@
+"""Every table behind the stats and figures is the same whichever dataframe backend computes it."""
+import numpy as np
+import pytest
+
+from billboard import compare_backends, differences
+
+pytest.importorskip('polars')
+
+
+def test_polars_matches_pandas(chart_csv):
+    results = compare_backends(chart_csv, ('pandas', 'polars'), trend=['104w', 'ewm52w'])
+    assert [name for name, seconds, diffs in results] == ['pandas', 'polars']
+    assert results[1][2] == []
+
+
+def test_polars_matches_pandas_with_other_eras(chart_csv):
+    results = compare_backends(chart_csv, ('pandas', 'polars'), boundaries=[1980, 2000], names=['A', 'B', 'C'])
+    assert results[1][2] == []
+
+
+def test_differences_finds_changed_values():
+    a = {'table': {'x': np.array([1.0, 2.0])}, 'count': 3}
+    b = {'table': {'x': np.array([1.0, 2.5])}, 'count': 4}
+    assert [where for where, how in differences(a, b)] == ['/table/x', '/count']
+    assert differences(a, {'table': {'x': np.array([1.0, 2.0 * (1 + 1e-15)])}, 'count': 3}) == []
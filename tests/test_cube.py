@@ -0,0 +1,40 @@
+"""Tables answered from the cube's cells match the ones computed from the rows."""
+import pytest
+
+from billboard import analyze, analyze_cube, build_cube, differences, stats_tables
+from cube import Cube
+from features import derive_features
+from ingest import read_source
+
+
+@pytest.fixture(scope='module')
+def in_memory(chart_csv):
+    return analyze(derive_features(read_source(chart_csv)))[1]
+
+
+def _comparable(inputs):
+    # the per-label Discogs tables need the rows' genre/style strings, so a cube has none
+    return {name: value for name, value in inputs.items() if name != 'labels'}
+
+
+@pytest.mark.parametrize('chunksize', [None, 700])
+def test_cube_matches_in_memory(chart_csv, in_memory, chunksize, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # keep the Parquet cache in the test's directory
+    cube = build_cube(chart_csv, chunksize)
+    assert differences(_comparable(in_memory), analyze_cube(cube)[1]) == []
+
+
+def test_saved_cube_matches_in_memory(chart_csv, in_memory, tmp_path):
+    build_cube(chart_csv, chunksize=1000).save(str(tmp_path / 'cube.npz'))
+    cube = Cube.load(str(tmp_path / 'cube.npz'))
+    assert differences(_comparable(in_memory), analyze_cube(cube)[1]) == []
+    assert set(stats_tables(analyze_cube(cube)[1])) == set(stats_tables(_comparable(in_memory)))
+
+
+def test_cube_with_other_eras(chart_csv, tmp_path):
+    boundaries, names = [1980, 2000], ['A', 'B', 'C']
+    expected = analyze(derive_features(read_source(chart_csv), boundaries, names),
+                       boundaries=boundaries, names=names)[1]
+    build_cube(chart_csv, chunksize=1000).save(str(tmp_path / 'cube.npz'))
+    cube = Cube.load(str(tmp_path / 'cube.npz'), boundaries, names)
+    assert differences(_comparable(expected), analyze_cube(cube)[1]) == []
@@ -0,0 +1,48 @@
+"""Streaming the CSV in chunks gives the same tables and figure inputs as loading it whole."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from billboard import analyze, analyze_stream, differences
+from features import derive_features
+from ingest import iter_chunks, read_source
+from streaming import Histogram
+
+
+@pytest.fixture(scope='module')
+def in_memory(chart_csv):
+    return analyze(derive_features(read_source(chart_csv)), trend=['26w', 'ewm52w'])[1]
+
+
+@pytest.mark.parametrize('chunksize', [700, 100_000])
+def test_chunks_match_in_memory(chart_csv, in_memory, chunksize):
+    chunks = (derive_features(chunk) for chunk in iter_chunks(chart_csv, chunksize))
+    acc, aggs, inputs = analyze_stream(chunks, trend=['26w', 'ewm52w'])
+    assert differences(in_memory, inputs) == []
+
+
+def test_chunks_match_in_memory_with_long_songs(chart_csv, tmp_path):
+    df = pd.read_csv(chart_csv)
+    # past the histogram's initial 1800 s range, in different chunks
+    df.loc[[10, 2500], 'Length (Sec)'] = [2400, 3000]
+    path = tmp_path / 'long.csv'
+    df.to_csv(path, index=False)
+    expected = analyze(derive_features(read_source(path)))[1]
+    acc, aggs, inputs = analyze_stream(derive_features(chunk) for chunk in iter_chunks(path, 1000))
+    assert differences(expected, inputs) == []
+    assert inputs['song_length']['box_stats'][0]['fliers'].max() == 40.0
+
+
+def test_histogram_merges_different_ranges():
+    a = Histogram('k', 'v').update(pd.DataFrame({'k': [1, 1, 2], 'v': [100.0, 200.0, 2400.0]}))
+    b = Histogram('k', 'v', lo=50, hi=60).update(pd.DataFrame({'k': [1, 3], 'v': [-5.0, 55.0]}))
+    a.merge(b)
+    assert (a.lo, a.hi) == (-5, 2400)
+    values, counts = a.group(1)
+    assert values.tolist() == [-5.0, 100.0, 200.0] and counts.tolist() == [1, 1, 1]
+    assert a.group(2)[0].tolist() == [2400.0]
+
+
+def test_histogram_refuses_fractions():
+    with pytest.raises(ValueError, match='whole numbers'):
+        Histogram('k', 'v').update(pd.DataFrame({'k': [1], 'v': [np.float64(181.5)]}))
@@ -0,0 +1,137 @@
+"""Weekly rolling-window and EWMA trends of the hit-level metrics.
+
+Hits are put on a weekly grid once: with weighting, each hit counts in every week it spent
+at #1 (so a 10-week #1 weighs 10 times a 1-week one, in the weeks it was actually on top),
+otherwise only in its first week. A trailing window's sum is then a difference of two
+cumulative sums and an EWMA is a one-pole filter over the weekly sums, so every window
+costs O(weeks), however many hits each covers.
+"""
+import numpy as np
+import pandas as pd
+
+# a Saturday (chart weeks end on Saturdays); week numbers count from here
+ORIGIN = pd.Timestamp('1958-08-02')
+
+
+def week_number(dates):
+    days = (np.asarray(dates, dtype='datetime64[D]') - np.datetime64(ORIGIN.date(), 'D')).astype(np.int64)
+    return days // 7
+
+
+class WeeklySeries:
+    """Per-week sums of each column's values and of their weights, mergeable across chunks.
+
+    weighted: spread each hit over its `Weeks at Number One` (missing counts as 1 week).
+    """
+
+    def __init__(self, columns, weighted=True, weeks_col='Weeks at Number One'):
+        self.columns = list(columns)
+        self.weighted = weighted
+        self.weeks_col = weeks_col
+        self.start = None
+        self.sums = self.weights = np.zeros((0, len(self.columns)))
+
+    def update(self, chunk):
+        if not len(chunk):
+            return self
+        first = week_number(chunk['Date'])
+        if self.weighted:
+            span = np.maximum(chunk[self.weeks_col].fillna(1).to_numpy(dtype='float64'), 1).astype(np.int64)
+        else:
+            span = np.ones(len(chunk), dtype=np.int64)
+        lo = first.min()
+        size = int((first + span).max() - lo)
+
+        part = WeeklySeries(self.columns, self.weighted, self.weeks_col)
+        part.start = lo
+        part.sums = np.empty((size, len(self.columns)))
+        part.weights = np.empty((size, len(self.columns)))
+        on, off = first - lo, first + span - lo
+        for j, col in enumerate(self.columns):
+            x = chunk[col].to_numpy(dtype='float64')
+            present = ~np.isnan(x)
+            x = np.where(present, x, 0)
+            # +x from the first week, -x after the last, then a running sum over weeks
+            for out, v in ((part.sums, x), (part.weights, present.astype('float64'))):
+                delta = np.bincount(on, weights=v, minlength=size + 1) - np.bincount(off, weights=v, minlength=size + 1)
+                out[:, j] = np.cumsum(delta[:size])
+        return self.merge(part)
+
+    def merge(self, other):
+        if other.start is None:
+            return self
+        if self.start is None:
+            self.start, self.sums, self.weights = other.start, other.sums, other.weights
+            return self
+        lo = min(self.start, other.start)
+        hi = max(self.start + len(self.sums), other.start + len(other.sums))
+        sums = np.zeros((hi - lo, len(self.columns)))
+        weights = np.zeros_like(sums)
+        for part in (self, other):
+            rows = slice(part.start - lo, part.start - lo + len(part.sums))
+            sums[rows] += part.sums
+            weights[rows] += part.weights
+        self.start, self.sums, self.weights = lo, sums, weights
+        return self
+
+    @property
+    def index(self):
+        weeks = np.arange(len(self.sums)) if self.start is None else self.start + np.arange(len(self.sums))
+        return pd.DatetimeIndex(ORIGIN + pd.to_timedelta(weeks * 7, unit='D'), name='week')
+
+    def _frame(self, label, num, den):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(den > 1e-9, num / den, np.nan)
+        columns = pd.MultiIndex.from_product([[label], self.columns], names=['window', 'metric'])
+        return pd.DataFrame(values, index=self.index, columns=columns)
+
+    def rolling(self, weeks):
+        """Weighted means over trailing windows of each length in weeks (ending at each week)."""
+        sums = np.vstack([np.zeros((1, len(self.columns))), np.cumsum(self.sums, axis=0)])
+        weights = np.vstack([np.zeros((1, len(self.columns))), np.cumsum(self.weights, axis=0)])
+        end = np.arange(1, len(self.sums) + 1)
+        frames = []
+        for w in weeks:
+            begin = np.maximum(end - int(w), 0)
+            frames.append(self._frame(f'{int(w)}w', sums[end] - sums[begin], weights[end] - weights[begin]))
+        return pd.concat(frames, axis=1)
+
+    def ewma(self, halflives):
+        """Exponentially weighted means with each half-life in weeks."""
+        from scipy.signal import lfilter
+
+        frames = []
+        for h in halflives:
+            decay = 0.5 ** (1 / float(h))
+            frames.append(self._frame(f'ewm{h:g}w', lfilter([1], [1, -decay], self.sums, axis=0),
+                                      lfilter([1], [1, -decay], self.weights, axis=0)))
+        return pd.concat(frames, axis=1)
+
+    def trends(self, specs):
+        """rolling() and ewma() for specs like ['26', '104', 'ewm52'], side by side in spec order."""
+        frames = []
+        for spec in specs:
+            spec = str(spec).strip()
+            if spec.startswith('ewm'):
+                frames.append(self.ewma([float(spec[3:].rstrip('w'))]))
+            else:
+                frames.append(self.rolling([int(spec.rstrip('w'))]))
+        return pd.concat(frames, axis=1)
+
+
+def parse_trend_specs(value):
+    """'26,104,ewm52' -> ['26w', '104w', 'ewm52w'] (validated)."""
+    specs = []
+    for spec in value.split(','):
+        spec = spec.strip().rstrip('w')
+        number = spec[3:] if spec.startswith('ewm') else spec
+        try:
+            if float(number) <= 0:
+                raise ValueError
+            if not spec.startswith('ewm'):
+                int(number)
+        except ValueError:
+            raise ValueError(f"bad trend window {spec!r}: use weeks (e.g. 104) or ewm<half-life weeks> (e.g. ewm52)") \
+                from None
+        specs.append(spec + 'w')
+    return specs